@@ -18,3 +18,37 @@ def create_app():
 
     # Return the Flask application instance
     return app
+
+
+# Load every lazily initialized component up front. Call it in the gunicorn
+# master before forking (see gunicorn.conf.py) so workers share the loaded
+# model and embedding pages copy-on-write instead of each loading their own.
+def warmup():
+    from .utils import (
+        get_stop_words,
+        get_intent_model,
+        load_properties_with_embeddings,
+        get_vector_index,
+        get_embedding_cache,
+        get_catalog,
+        get_lexical_index,
+        get_intent_cascade,
+    )
+    from .langchain_ import get_rag_chain
+    from .messaging import get_messenger
+    from .sessions import get_session_backend
+    import config
+
+    get_stop_words()
+    get_intent_model()
+    if config.INTENT_CASCADE:
+        get_intent_cascade()
+    store = load_properties_with_embeddings()
+    get_vector_index(store)
+    if config.LEXICAL_RETRIEVAL == "hybrid":
+        get_lexical_index(store)
+    get_embedding_cache()
+    get_catalog().properties()
+    get_rag_chain()
+    get_messenger()
+    get_session_backend()
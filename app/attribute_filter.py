@@ -0,0 +1,221 @@
+import re
+import unicodedata
+import numpy as np
+
+NUMBER_WORDS = {
+    "un": 1,
+    "una": 1,
+    "uno": 1,
+    "dos": 2,
+    "tres": 3,
+    "cuatro": 4,
+    "cinco": 5,
+    "seis": 6,
+    "siete": 7,
+    "ocho": 8,
+    "nueve": 9,
+    "diez": 10,
+}
+_COUNT = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+_AMOUNT = r"\$?\s*(\d[\d.,]*)(?:\s*(millones|millon|mil|k)\b)?"
+# Count bounds as (keyword pattern, offset): "mas de 2" means at least 3 and
+# "menos de 3" at most 2. "mas de" must not be part of "no mas de".
+_COUNT_AT_LEAST = (
+    (r"\b(?:al menos|minimo|desde|por lo menos)\s+", 0),
+    (r"(?<!no )\bmas de\s+", 1),
+)
+_COUNT_AT_MOST = (
+    (r"\b(?:hasta|maximo|no mas de|a lo sumo)\s+", 0),
+    (r"\bmenos de\s+", -1),
+)
+
+COUNT_FIELDS = {
+    "bedrooms": r"(?:habitaciones|habitacion|dormitorios|dormitorio|cuartos|cuarto|recamaras|hab)\b",
+    "bathrooms": r"(?:banos|bano)\b",
+    "parking_spots": r"(?:parqueaderos|parqueadero|estacionamientos|estacionamiento|garajes|garaje)\b",
+}
+
+
+# Lowercase and strip accents so "Cumbayá" and "cumbaya" compare equal
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+# Parse amounts such as "$150.000", "150,000", "1.250,50" or "120 m2"
+def parse_number(text):
+    if text is None:
+        return None
+    match = re.search(r"\d[\d.,]*", str(text))
+    if not match:
+        return None
+    number = match.group(0).rstrip(".,")
+    if "." in number and "," in number:
+        # The last separator is the decimal one
+        decimal = "." if number.rfind(".") > number.rfind(",") else ","
+        thousands = "," if decimal == "." else "."
+        number = number.replace(thousands, "").replace(decimal, ".")
+    else:
+        for separator in ".,":
+            parts = number.split(separator)
+            if len(parts) > 1:
+                # Groups of three digits are thousands, anything else decimals
+                if all(len(part) == 3 for part in parts[1:]):
+                    number = "".join(parts)
+                else:
+                    number = number.replace(separator, ".")
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+def _count(value):
+    return int(value) if value.isdigit() else NUMBER_WORDS[value]
+
+
+def _amount(value, unit):
+    amount = parse_number(value)
+    if amount is None:
+        return None
+    if unit in ("k", "mil"):
+        amount *= 1000
+    elif unit in ("millon", "millones"):
+        amount *= 1000000
+    return amount
+
+
+# First "<keyword> <amount>" match that is not a count such as "2 habitaciones"
+def _price_bound(keyword, text, amount=_AMOUNT):
+    count_noun = r"\s*(?:" + "|".join(COUNT_FIELDS.values()) + ")"
+    for match in re.finditer(keyword + amount, text):
+        if not re.match(count_noun, text[match.end() :]):
+            return match
+    return None
+
+
+# Count of the first "<keyword> <count> <noun>" match, adjusted by the
+# keyword's offset
+def _count_bound(keywords, noun, text):
+    for keyword, offset in keywords:
+        match = re.search(keyword + _COUNT + r"\s+" + noun, text)
+        if match:
+            return _count(match.group(1)) + offset
+    return None
+
+
+# Extract structured constraints from a Spanish query, e.g.
+# "3 habitaciones en Cumbayá bajo 200000" ->
+# {"bedrooms": (3, 3), "price": (None, 200000.0), "places": {"cumbaya"}}
+def parse_query_constraints(query, places=()):
+    text = normalize(query)
+    constraints = {}
+
+    for field, noun in COUNT_FIELDS.items():
+        match = re.search(
+            r"\bentre\s+" + _COUNT + r"\s+y\s+" + _COUNT + r"\s+" + noun, text
+        )
+        if match:
+            constraints[field] = (_count(match.group(1)), _count(match.group(2)))
+            continue
+        low = _count_bound(_COUNT_AT_LEAST, noun, text)
+        high = _count_bound(_COUNT_AT_MOST, noun, text)
+        if low is not None or high is not None:
+            constraints[field] = (low, high)
+            continue
+        match = re.search(r"\b" + _COUNT + r"\s+" + noun, text)
+        if match:
+            count = _count(match.group(1))
+            constraints[field] = (count, count)
+        elif field == "parking_spots" and re.search(r"\bcon\s+" + noun, text):
+            constraints[field] = (1, None)
+
+    match = _price_bound(r"entre\s+", text, _AMOUNT + r"\s+y\s+" + _AMOUNT)
+    if match:
+        constraints["price"] = (
+            _amount(match.group(1), match.group(2)),
+            _amount(match.group(3), match.group(4)),
+        )
+    else:
+        low = _price_bound(r"(?<!no )\b(?:mas de|desde|minimo|sobre)\s+", text)
+        high = _price_bound(
+            r"\b(?:bajo|menos de|hasta|maximo|menor a|no mas de)\s+", text
+        )
+        if low or high:
+            constraints["price"] = (
+                _amount(low.group(1), low.group(2)) if low else None,
+                _amount(high.group(1), high.group(2)) if high else None,
+            )
+
+    found = {
+        place
+        for place in places
+        if place and re.search(rf"\b{re.escape(place)}\b", text)
+    }
+    if found:
+        constraints["places"] = found
+
+    return constraints
+
+
+def _first_int(value):
+    if value is None or value == "N/A":
+        return np.nan
+    match = re.search(r"\d+", str(value))
+    return float(match.group(0)) if match else np.nan
+
+
+class AttributeIndex:
+    """Columnar NumPy arrays of listing attributes aligned with store rows."""
+
+    NUMERIC_FIELDS = ("bedrooms", "bathrooms", "parking_spots", "price", "fee", "area")
+
+    def __init__(self, properties):
+        # properties[i] is the listing for row i of the embedding store
+        # (None when the listing is no longer in the catalog)
+        self.size = len(properties)
+        self.columns = {}
+        for field in ("bedrooms", "bathrooms", "parking_spots"):
+            self.columns[field] = np.array(
+                [_first_int(p.get(field)) if p else np.nan for p in properties],
+                dtype=np.float64,
+            )
+        for field in ("price", "fee", "area"):
+            values = [parse_number(p.get(field)) if p else None for p in properties]
+            self.columns[field] = np.array(
+                [np.nan if v is None else v for v in values], dtype=np.float64
+            )
+
+        # Neighborhood and location as integer codes over a shared vocabulary
+        self.vocabulary = {}
+        for field in ("neighborhood", "location"):
+            codes = []
+            for p in properties:
+                name = normalize(p.get(field, "")).strip() if p else ""
+                codes.append(self.vocabulary.setdefault(name, len(self.vocabulary)))
+            self.columns[field] = np.array(codes, dtype=np.int32)
+
+    @property
+    def places(self):
+        return [name for name in self.vocabulary if name]
+
+    # Boolean mask of rows satisfying every constraint, or None if there are none
+    def filter(self, constraints):
+        if not constraints:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        for field in self.NUMERIC_FIELDS:
+            if field not in constraints:
+                continue
+            low, high = constraints[field]
+            column = self.columns[field]
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+        if "places" in constraints:
+            codes = [self.vocabulary[place] for place in constraints["places"]]
+            mask &= np.isin(self.columns["neighborhood"], codes) | np.isin(
+                self.columns["location"], codes
+            )
+        return mask
@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
+LISTINGS_PATH = os.path.join(DATA_DIR, "property_listings.json")
+AGENTS_PATH = os.path.join(DATA_DIR, "agent_data.json")
+
+
+class _Snapshot:
+    def __init__(self, properties, agents, mtimes):
+        self.properties = properties
+        self.by_id = {int(property["id"]): property for property in properties}
+        # agent_data.json is keyed by the property id as a string
+        self.agents = {str(key): value for key, value in agents.items()}
+        self.mtimes = mtimes
+
+
+class Catalog:
+    """Property listings and agents indexed by property id.
+
+    Both files are loaded once into dicts. Lookups check the files' mtimes
+    (at most every ``check_interval`` seconds) and rebuild a complete new
+    snapshot when either changed; the snapshot reference is swapped in one
+    assignment, so a request sees either the old catalog or the new one,
+    never a half-loaded mix.
+    """
+
+    def __init__(
+        self, listings_path=LISTINGS_PATH, agents_path=AGENTS_PATH, check_interval=2.0
+    ):
+        self.listings_path = listings_path
+        self.agents_path = agents_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked = 0.0
+        self.version = 0
+
+    def _mtimes(self):
+        return (
+            os.path.getmtime(self.listings_path),
+            os.path.getmtime(self.agents_path),
+        )
+
+    def _load(self, mtimes):
+        with open(self.listings_path, "r") as f:
+            properties = json.load(f)
+        with open(self.agents_path, "r") as f:
+            agents = json.load(f)
+        return _Snapshot(properties, agents, mtimes)
+
+    def _current(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and now - self._checked < self.check_interval:
+                return snapshot
+            self._checked = now
+            mtimes = self._mtimes()
+            if snapshot is None or mtimes != snapshot.mtimes:
+                try:
+                    self._snapshot = self._load(mtimes)
+                    self.version += 1
+                except ValueError as e:
+                    # A file caught mid-write; keep serving the old snapshot
+                    if snapshot is None:
+                        raise
+                    print(f"Failed to reload catalog, keeping previous: {e}")
+            return self._snapshot
+
+    def properties(self):
+        return self._current().properties
+
+    def get_property(self, property_id):
+        return self._current().by_id.get(int(property_id))
+
+    def get_agent(self, property_id):
+        return self._current().agents.get(str(property_id).strip())
@@ -1,58 +1,54 @@
-import pandas as pd
+import argparse
 from utils import clean_text
 from sklearn.model_selection import train_test_split
-from datasets import Dataset
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
-    Trainer,
-    TrainingArguments,
     EarlyStoppingCallback,
 )
+from intent_training import (
+    EpochTimer,
+    build_trainer,
+    configure_cpu_threads,
+    load_labelled_csv,
+    tokenize_dataset,
+    training_arguments,
+)
 import torch
 import json
 
-torch.mps.empty_cache()
+parser = argparse.ArgumentParser(description="Fine-tune the intent classifier")
+parser.add_argument("--output", default="./results/model-6")
+parser.add_argument("--epochs", type=float, default=5)
+parser.add_argument("--threads", type=int, help="CPU threads (default: all cores)")
+parser.add_argument(
+    "--static-padding",
+    action="store_true",
+    help="Pad every sample to 50 tokens and batch in random order, as before",
+)
+args = parser.parse_args()
+dynamic_padding = not args.static_padding
 
-# Load your dataset
-dataset = pd.read_csv("data/contact_agent_dataset.csv")
+if torch.backends.mps.is_available():
+    torch.mps.empty_cache()
+print(f"Using {configure_cpu_threads(args.threads)} CPU threads")
 
-# Turn labels to numerical values and clean text
-label_mapping = {"contact agent": 0, "other": 1}
-dataset["label"] = dataset["label"].map(label_mapping)
-dataset["query"] = dataset["query"].map(clean_text)
+# Load your dataset, turn labels to numerical values and clean text
+dataset = load_labelled_csv("data/contact_agent_dataset.csv", clean_text)
 
 # Split the dataset into train and test sets
 train_df, test_df = train_test_split(dataset, test_size=0.2, random_state=42)
 
-# Convert to Hugging Face datasets
-train_dataset = Dataset.from_pandas(train_df)
-test_dataset = Dataset.from_pandas(test_df)
-
 # Load the tokenizer
 tokenizer = AutoTokenizer.from_pretrained("roberta-base")
 
-
-# Preprocess the dataset
-def preprocess_function(examples):
-    # Tokenize the text
-    inputs = tokenizer(
-        examples["query"], padding="max_length", truncation=True, max_length=50
-    )
-    # Add the labels
-    inputs["labels"] = examples["label"]
-    return inputs
-
-
-# Apply the preprocessing to the datasets
-train_dataset = train_dataset.map(preprocess_function, batched=True)
-test_dataset = test_dataset.map(preprocess_function, batched=True)
-
-# Set the format for PyTorch
-train_dataset.set_format(
-    type="torch", columns=["input_ids", "attention_mask", "labels"]
+# Tokenize the datasets, or load them from the cache if unchanged
+train_dataset = tokenize_dataset(
+    train_df, tokenizer, pad_to_max_length=not dynamic_padding
+)
+test_dataset = tokenize_dataset(
+    test_df, tokenizer, pad_to_max_length=not dynamic_padding
 )
-test_dataset.set_format(type="torch", columns=["input_ids", "attention_mask", "labels"])
 
 # Load the pre-trained BERT model
 model = AutoModelForSequenceClassification.from_pretrained(
@@ -63,43 +59,33 @@ model = AutoModelForSequenceClassification.from_pretrained(
 model.classifier.dropout = torch.nn.Dropout(p=0.3)
 
 # Define training arguments
-training_args = TrainingArguments(
-    output_dir="./results",
-    eval_strategy="steps",
-    eval_steps=20,
-    save_strategy="steps",
-    learning_rate=5e-6,
-    lr_scheduler_type="linear",
-    warmup_steps=50,
-    num_train_epochs=5,
-    weight_decay=0.05,
-    per_device_train_batch_size=8,
-    per_device_eval_batch_size=8,
-    logging_dir="./logs",
-    logging_steps=20,
-    load_best_model_at_end=True,
-    metric_for_best_model="eval_loss",
-    greater_is_better=False,
+training_args = training_arguments(
+    "./results", dynamic_padding=dynamic_padding, num_train_epochs=args.epochs
 )
 
 # Define the trainer
-trainer = Trainer(
-    model=model,
-    args=training_args,
+epoch_timer = EpochTimer()
+trainer = build_trainer(
+    model,
+    tokenizer,
+    training_args,
     train_dataset=train_dataset,
     eval_dataset=test_dataset,
-    callbacks=[EarlyStoppingCallback(early_stopping_patience=2)],
+    dynamic_padding=dynamic_padding,
+    callbacks=[EarlyStoppingCallback(early_stopping_patience=2), epoch_timer],
 )
 
 # Train the model
 trainer.train()
+epoch_times = ", ".join(f"{seconds:.1f}s" for seconds in epoch_timer.epoch_times)
+print(f"Epoch times: {epoch_times}")
 
 # Evaluate the model
 results = trainer.evaluate()
 print(results)
 
 # Save model
-model_folder = "./results/model-6"
+model_folder = args.output
 trainer.save_model(model_folder)
 
 # Save the training history to a JSON file
@@ -1,46 +1,60 @@
-import pandas as pd
-from datasets import Dataset
+import argparse
 from utils import clean_text
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, Trainer
+from transformers import (
+    AutoTokenizer,
+    AutoModelForSequenceClassification,
+    TrainingArguments,
+)
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+from intent_training import (
+    build_trainer,
+    configure_cpu_threads,
+    load_labelled_csv,
+    predict,
+    tokenize_dataset,
+)
 
-# Load the Test Dataset
-test_dataset_path = "./data/test_contact_agent.csv"
-test_df = pd.read_csv(test_dataset_path)
-
-# Map string labels to numerical values and clean text
-label_mapping = {"contact agent": 0, "other": 1}
-test_df["label"] = test_df["label"].map(label_mapping)
-test_df["query"] = test_df["query"].map(clean_text)
+parser = argparse.ArgumentParser(description="Evaluate the intent classifier")
+parser.add_argument("--model", default="./results/model-6")
+parser.add_argument("--batch-size", type=int, default=64)
+parser.add_argument("--threads", type=int, help="CPU threads (default: all cores)")
+parser.add_argument(
+    "--static-padding",
+    action="store_true",
+    help="Pad every sample to 50 tokens, as before",
+)
+args = parser.parse_args()
+dynamic_padding = not args.static_padding
+print(f"Using {configure_cpu_threads(args.threads)} CPU threads")
 
-# Convert to Hugging Face Dataset
-test_dataset = Dataset.from_pandas(test_df)
+# Load the Test Dataset, map string labels to numerical values and clean text
+test_dataset_path = "./data/test_contact_agent.csv"
+test_df = load_labelled_csv(test_dataset_path, clean_text)
 
 # Load the Trained Model and Tokenizer
-model_path = "./results/model-6"
+model_path = args.model
 model = AutoModelForSequenceClassification.from_pretrained(model_path)
 model.eval()
 tokenizer = AutoTokenizer.from_pretrained("roberta-base")
 
+# Tokenize the Test Dataset, or load it from the cache if unchanged
+test_dataset = tokenize_dataset(
+    test_df, tokenizer, pad_to_max_length=not dynamic_padding
+)
 
-# Preprocess the Test Dataset
-def preprocess_function(examples):
-    return tokenizer(
-        examples["query"], padding="max_length", truncation=True, max_length=50
-    )
-
-
-test_dataset = test_dataset.map(preprocess_function, batched=True)
-test_dataset.set_format(type="torch", columns=["input_ids", "attention_mask", "label"])
-
-trainer = Trainer(model=model)
+trainer = build_trainer(
+    model,
+    tokenizer,
+    TrainingArguments(
+        output_dir="./results",
+        per_device_eval_batch_size=args.batch_size,
+        report_to="none",
+    ),
+    dynamic_padding=dynamic_padding,
+)
 
 # Make predictions
-predictions = trainer.predict(test_dataset)
-
-# Extract the logits and apply softmax to get probabilities
-logits = predictions.predictions
-predicted_labels = logits.argmax(axis=-1)
+predicted_labels, metrics = predict(trainer, test_dataset)
 
 # Get the true labels
 true_labels = test_dataset["label"]
@@ -68,3 +82,7 @@ print(f"Accuracy: {accuracy:.4f}")
 print(f"Precision: {precision:.4f}")
 print(f"Recall: {recall:.4f}")
 print(f"F1 Score: {f1:.4f}")
+print(
+    f"Eval: {metrics['test_runtime']:.2f}s, "
+    f"{metrics['test_samples_per_second']:.1f} samples/s"
+)
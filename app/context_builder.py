@@ -0,0 +1,112 @@
+import re
+from langchain_core.documents import Document
+from app.sessions import approx_token_count, trim_history
+
+
+# Token counter matching the chat model's tokenizer. tiktoken needs its
+# encoding file, which it downloads once into TIKTOKEN_CACHE_DIR; when that
+# is not possible (offline, not installed) the ~4 characters per token
+# estimate is used instead.
+def tiktoken_counter(model="gpt-4o-mini"):
+    import tiktoken
+
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def get_token_counter(name="tiktoken", model="gpt-4o-mini"):
+    if name == "approx":
+        return approx_token_count
+    if name != "tiktoken":
+        raise ValueError(f"Unknown token counter '{name}'. Choose tiktoken or approx")
+    try:
+        return tiktoken_counter(model)
+    except Exception as e:
+        print(f"tiktoken unavailable ({e}), estimating token counts")
+        return approx_token_count
+
+
+# Longest prefix of whole words that fits in max_tokens, with an ellipsis
+# when something was cut. Binary search, so it works with any counter.
+def truncate_to_tokens(text, max_tokens, count_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle]) + "…") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + "…" if low else ""
+
+
+_DESCRIPTION = re.compile(r"Descripción:(.*?)(?=^\s*Enlace:|\Z)", re.S | re.M)
+
+
+# Compact a listing formatted by utils.property_to_string: strip the
+# indentation, drop fields without a value and shorten the description to
+# description_tokens
+def compact_listing(text, description_tokens, count_tokens):
+    description = ""
+    match = _DESCRIPTION.search(text)
+    if match:
+        description = truncate_to_tokens(
+            " ".join(match.group(1).split()), description_tokens, count_tokens
+        )
+        text = text[: match.start()] + text[match.end() :]
+
+    lines = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if not line or line.endswith(":") or line.endswith(": N/A"):
+            continue
+        lines.append(line)
+    if description:
+        lines.append(f"Descripción: {description}")
+    return "\n".join(lines)
+
+
+class ContextBuilder:
+    """Fits the retrieved listings and the chat history into a token budget.
+
+    Listings are compacted and added in rank order while they fit in
+    ``max_tokens`` (the best one is always kept); the chat history gets
+    whatever budget is left, keeping its most recent turns.
+    """
+
+    def __init__(self, max_tokens=3000, description_tokens=120, count_tokens=None):
+        self.max_tokens = max_tokens
+        self.description_tokens = description_tokens
+        self.count_tokens = count_tokens or approx_token_count
+
+    def fit(self, documents, chat_history):
+        listings = []
+        listing_tokens = 0
+        for document in documents:
+            listing = compact_listing(
+                document.page_content, self.description_tokens, self.count_tokens
+            )
+            cost = self.count_tokens(listing)
+            if listings and listing_tokens + cost > self.max_tokens:
+                break
+            listings.append(Document(page_content=listing, metadata=document.metadata))
+            listing_tokens += cost
+
+        history = trim_history(
+            chat_history,
+            max_tokens=max(0, self.max_tokens - listing_tokens),
+            token_counter=self.count_tokens,
+        )
+        history_tokens = sum(self.count_tokens(str(m.content)) for m in history)
+        stats = {
+            "listings": len(listings),
+            "listing_tokens": listing_tokens,
+            "history_messages": len(history),
+            "history_tokens": history_tokens,
+        }
+        return listings, history, stats
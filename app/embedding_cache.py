@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app import metrics
+
+
+class SQLiteVectorTier:
+    """On-disk vector cache that several worker processes can share."""
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        self._pid = os.getpid()
+        self._connection = sqlite3.connect(
+            self.path, check_same_thread=False, timeout=5
+        )
+        # WAL lets readers in other workers proceed while one of them writes
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    # The cache is created by warmup() in the gunicorn master; SQLite
+    # connections must not cross fork, so each worker opens its own
+    @property
+    def _conn(self):
+        if self._pid != os.getpid():
+            self._connect()
+        return self._connection
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        vector, created = row
+        if self.ttl and time.time() - created > self.ttl:
+            return None
+        return np.frombuffer(vector, dtype=np.float32)
+
+    def set(self, key, vector):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created) "
+                "VALUES (?, ?, ?)",
+                (key, np.asarray(vector, dtype=np.float32).tobytes(), time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+
+class EmbeddingCache:
+    """LRU + TTL cache in front of an embedding function.
+
+    ``embed_fn`` takes a list of strings and returns one vector per string,
+    like ``utils.openai_embeddings``. Keys are produced by ``normalize`` so
+    "Hola!" and "hola" share an entry. An optional SQLite file adds a second
+    tier shared between processes.
+    """
+
+    def __init__(
+        self, embed_fn, normalize=None, max_size=1024, ttl=86400, disk_path=None
+    ):
+        self.embed_fn = embed_fn
+        self.normalize = normalize or (lambda text: text)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk = SQLiteVectorTier(disk_path, ttl) if disk_path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, created = entry
+            if self.ttl and time.monotonic() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _set_memory(self, key, vector):
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def embed(self, texts):
+        keys = [self.normalize(text) for text in texts]
+        vectors = [None] * len(texts)
+        missing = {}
+
+        for i, key in enumerate(keys):
+            vector = self._get_memory(key)
+            if vector is not None:
+                self.hits += 1
+                metrics.increment(
+                    "cache_lookups_total", cache="embedding", result="hit"
+                )
+            elif self.disk is not None and (vector := self.disk.get(key)) is not None:
+                self.disk_hits += 1
+                metrics.increment(
+                    "cache_lookups_total", cache="embedding", result="disk_hit"
+                )
+                self._set_memory(key, vector)
+            else:
+                # Identical keys in one batch are embedded only once
+                missing.setdefault(key, []).append(i)
+                continue
+            vectors[i] = vector
+
+        if missing:
+            self.misses += len(missing)
+            metrics.increment(
+                "cache_lookups_total", len(missing), cache="embedding", result="miss"
+            )
+            miss_keys = list(missing)
+            # Embed the original text of the first occurrence of each key
+            embedded = self.embed_fn([texts[missing[key][0]] for key in miss_keys])
+            for key, vector in zip(miss_keys, embedded):
+                vector = np.asarray(vector, dtype=np.float32)
+                self._set_memory(key, vector)
+                if self.disk is not None:
+                    self.disk.set(key, vector)
+                for i in missing[key]:
+                    vectors[i] = vector
+
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed([text])[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "size": len(self._entries),
+        }
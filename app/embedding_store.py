@@ -0,0 +1,143 @@
+import json
+import os
+import re
+import sys
+import time
+import numpy as np
+
+# Default location of the compiled embedding store
+STORE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "data", "embeddings")
+)
+CSV_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "data", "openai_embeddings.csv")
+)
+# Matrix written by stores that predate versioned matrix files
+MATRIX_FILE = "embeddings.npy"
+SIDECAR_FILE = "properties.json"
+
+
+class EmbeddingStore:
+    """Read-only float32 embedding matrix with its property ids and strings.
+
+    The matrix is memory-mapped, so every worker process that opens the same
+    store shares the pages through the OS page cache instead of holding its
+    own copy.
+    """
+
+    def __init__(self, embeddings, ids, property_strings, hashes=None):
+        if len(embeddings) != len(ids) or len(ids) != len(property_strings):
+            raise ValueError("Embeddings, ids and property strings must align")
+        self.embeddings = embeddings
+        self.ids = ids
+        self.property_strings = property_strings
+        # Hash of the embedded text per row, used for incremental indexing
+        self.hashes = hashes
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dimension(self):
+        return self.embeddings.shape[1]
+
+
+# Property strings produced by property_to_string start with "ID:<id>"
+def _parse_property_id(property_string):
+    match = re.search(r"ID:\s*(\d+)", property_string)
+    return int(match.group(1)) if match else None
+
+
+# Write a new versioned matrix, then atomically replace the sidecar that
+# points to it. Readers always open the sidecar first and then the matrix it
+# names, so they see either the old store or the new one. The previous
+# matrix is kept for readers that already read the old sidecar.
+def write_store(store_dir, embeddings, ids, property_strings, hashes=None):
+    os.makedirs(store_dir, exist_ok=True)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    sidecar_path = os.path.join(store_dir, SIDECAR_FILE)
+    previous_matrix = None
+    if os.path.exists(sidecar_path):
+        with open(sidecar_path, "r") as f:
+            previous_matrix = json.load(f).get("matrix", MATRIX_FILE)
+
+    matrix_file = f"embeddings-{time.time_ns()}.npy"
+    tmp_matrix = os.path.join(store_dir, matrix_file + ".tmp")
+    tmp_sidecar = sidecar_path + ".tmp"
+
+    with open(tmp_matrix, "wb") as f:
+        np.save(f, embeddings)
+    os.replace(tmp_matrix, os.path.join(store_dir, matrix_file))
+    with open(tmp_sidecar, "w") as f:
+        json.dump(
+            {
+                "matrix": matrix_file,
+                "ids": list(ids),
+                "property_strings": list(property_strings),
+                "hashes": list(hashes) if hashes is not None else None,
+                "dimension": int(embeddings.shape[1]) if embeddings.size else 0,
+            },
+            f,
+            ensure_ascii=False,
+        )
+    os.replace(tmp_sidecar, sidecar_path)
+
+    # Remove matrices older than the previous one
+    for name in os.listdir(store_dir):
+        if name.endswith(".npy") and name not in (matrix_file, previous_matrix):
+            os.remove(os.path.join(store_dir, name))
+
+
+def load_store(store_dir=STORE_DIR, mmap=True):
+    with open(os.path.join(store_dir, SIDECAR_FILE), "r") as f:
+        sidecar = json.load(f)
+    embeddings = np.load(
+        os.path.join(store_dir, sidecar.get("matrix", MATRIX_FILE)),
+        mmap_mode="r" if mmap else None,
+    )
+    return EmbeddingStore(
+        embeddings,
+        sidecar["ids"],
+        sidecar["property_strings"],
+        hashes=sidecar.get("hashes"),
+    )
+
+
+# Changes whenever write_store publishes a new version of the store
+def store_version(store_dir=STORE_DIR):
+    return os.path.getmtime(os.path.join(store_dir, SIDECAR_FILE))
+
+
+# Convert the CSV written by utils.save_properties_to_csv into a compiled store
+def convert_csv_to_store(csv_path=CSV_PATH, store_dir=STORE_DIR):
+    import csv
+
+    csv.field_size_limit(sys.maxsize)
+    property_strings = []
+    rows = []
+    with open(csv_path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            property_strings.append(row["property_string"])
+            # The embedding column is a Python list literal of floats, which
+            # is also valid JSON and far cheaper to parse than eval
+            rows.append(json.loads(row["embedding"]))
+
+    embeddings = np.array(rows, dtype=np.float32)
+    if embeddings.size == 0:
+        embeddings = embeddings.reshape(0, 0)
+    ids = [_parse_property_id(s) for s in property_strings]
+    write_store(store_dir, embeddings, ids, property_strings)
+    return len(ids)
+
+
+def store_exists(store_dir=STORE_DIR):
+    return os.path.exists(os.path.join(store_dir, SIDECAR_FILE))
+
+
+if __name__ == "__main__":
+    # Usage: python app/embedding_store.py [csv_path] [store_dir]
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else CSV_PATH
+    store_dir = sys.argv[2] if len(sys.argv) > 2 else STORE_DIR
+    count = convert_csv_to_store(csv_path, store_dir)
+    print(f"Wrote {count} embeddings to {store_dir}")
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from app import metrics
+
+
+class _Delivery:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+        self.finished_at = None
+
+
+class DeliveryTable:
+    """Webhook deliveries in flight and recently completed, by key.
+
+    The first delivery of a key computes the result; a duplicate that
+    arrives while it is running waits for it (up to ``wait_timeout``
+    seconds) and gets the same result, and one that arrives after it
+    finished gets the stored result without recomputing. Completed results
+    are kept for ``ttl`` seconds, at most ``max_size`` of them. If the first
+    delivery fails nothing is stored, so the next duplicate computes again.
+    """
+
+    def __init__(self, ttl=3600, max_size=10000, wait_timeout=10):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self._in_flight = {}
+        # Completed deliveries, oldest first
+        self._completed = OrderedDict()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.suppressed = {"in_flight": 0, "completed": 0}
+        self.timeouts = 0
+
+    def _expire(self, now):
+        while self._completed:
+            key, delivery = next(iter(self._completed.items()))
+            if len(self._completed) <= self.max_size and (
+                not self.ttl or now - delivery.finished_at <= self.ttl
+            ):
+                break
+            del self._completed[key]
+
+    # Returns (result, duplicate). `result` is None for a duplicate whose
+    # original delivery is still running after wait_timeout. With
+    # retain=False the result is only shared with concurrent duplicates.
+    def run(self, key, compute, retain=True):
+        while True:
+            with self._lock:
+                self._expire(time.monotonic())
+                delivery = self._completed.get(key) or self._in_flight.get(key)
+                owner = delivery is None
+                if owner:
+                    delivery = self._in_flight[key] = _Delivery()
+
+            if owner:
+                return self._compute(key, delivery, compute, retain), False
+
+            state = "completed" if delivery.done.is_set() else "in_flight"
+            if not delivery.done.wait(self.wait_timeout):
+                with self._lock:
+                    self.timeouts += 1
+                    self.suppressed[state] += 1
+                metrics.increment("webhook_duplicates_total", state=state)
+                return None, True
+            if delivery.failed:
+                continue
+            with self._lock:
+                self.suppressed[state] += 1
+            metrics.increment("webhook_duplicates_total", state=state)
+            return delivery.result, True
+
+    def _compute(self, key, delivery, compute, retain):
+        try:
+            result = compute()
+        except BaseException:
+            with self._lock:
+                del self._in_flight[key]
+            delivery.failed = True
+            delivery.done.set()
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            delivery.result = result
+            delivery.finished_at = time.monotonic()
+            if retain:
+                self._completed[key] = delivery
+                self._expire(delivery.finished_at)
+            self.processed += 1
+        delivery.done.set()
+        return result
+
+    def stats(self):
+        return {
+            "processed": self.processed,
+            "suppressed": dict(self.suppressed),
+            "timeouts": self.timeouts,
+            "in_flight": len(self._in_flight),
+            "completed": len(self._completed),
+        }
@@ -0,0 +1,161 @@
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.embedding_store import STORE_DIR, load_store, store_exists, write_store
+from app.utils import (
+    clean_and_transform_data,
+    openai_embeddings,
+    property_data,
+    property_to_string,
+)
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Call embed_fn, retrying failures with exponential backoff and jitter
+def embed_with_retry(embed_fn, texts, max_retries=5, base_delay=1.0):
+    for attempt in range(max_retries + 1):
+        try:
+            vectors = embed_fn(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(
+                    f"Expected {len(texts)} embeddings, got {len(vectors)}"
+                )
+            return vectors
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = base_delay * 2**attempt * random.uniform(0.5, 1.0)
+            print(f"Embedding batch failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+# Bring the embedding store in line with the listings, embedding only the
+# listings whose clean_and_transform_data text is new or changed
+def update_embedding_store(
+    properties,
+    store_dir=STORE_DIR,
+    embed_fn=openai_embeddings,
+    batch_size=100,
+    concurrency=4,
+    max_retries=5,
+):
+    start = time.perf_counter()
+
+    existing = load_store(store_dir, mmap=False) if store_exists(store_dir) else None
+    # Stores compiled from the CSV carry no content hashes, so every listing
+    # is embedded once and the hashes are recorded for the next run
+    unhashed = existing is not None and existing.hashes is None
+    previous = {}
+    if existing is not None and not unhashed:
+        previous = {
+            property_id: (row, row_hash)
+            for row, (property_id, row_hash) in enumerate(
+                zip(existing.ids, existing.hashes)
+            )
+        }
+
+    ids = [int(property["id"]) for property in properties]
+    property_strings = [property_to_string(property) for property in properties]
+    texts = [clean_and_transform_data(property) for property in properties]
+    hashes = [text_hash(text) for text in texts]
+
+    to_embed = [
+        i
+        for i, (property_id, row_hash) in enumerate(zip(ids, hashes))
+        if previous.get(property_id, (None, None))[1] != row_hash
+    ]
+    batches = [
+        to_embed[i : i + batch_size] for i in range(0, len(to_embed), batch_size)
+    ]
+
+    # Bounded number of embedding requests in flight at once
+    embed_start = time.perf_counter()
+    new_vectors = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = pool.map(
+            lambda batch: embed_with_retry(
+                embed_fn, [texts[i] for i in batch], max_retries=max_retries
+            ),
+            batches,
+        )
+        for batch, vectors in zip(batches, results):
+            new_vectors.update(zip(batch, vectors))
+    embed_time = time.perf_counter() - embed_start
+
+    removed = len(set(existing.ids) - set(ids)) if existing is not None else 0
+    stats = {
+        "total": len(ids),
+        "embedded": len(to_embed),
+        "reused": len(ids) - len(to_embed),
+        "removed": removed,
+        "batches": len(batches),
+        "embed_seconds": embed_time,
+        "unhashed": unhashed,
+    }
+
+    unchanged = (
+        existing is not None
+        and not to_embed
+        and existing.ids == ids
+        and existing.property_strings == property_strings
+    )
+    if not unchanged:
+        if new_vectors:
+            dimension = len(next(iter(new_vectors.values())))
+        elif existing is not None:
+            dimension = existing.dimension
+        else:
+            # No store yet and no listings: write an empty one
+            dimension = 0
+        matrix = np.empty((len(ids), dimension), dtype=np.float32)
+        for i, property_id in enumerate(ids):
+            if i in new_vectors:
+                matrix[i] = new_vectors[i]
+            else:
+                matrix[i] = existing.embeddings[previous[property_id][0]]
+        write_store(store_dir, matrix, ids, property_strings, hashes=hashes)
+
+    stats["written"] = not unchanged
+    stats["total_seconds"] = time.perf_counter() - start
+    return stats
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.indexer [--batch-size 100] [--concurrency 4]
+    parser = argparse.ArgumentParser(description="Incrementally embed listings")
+    parser.add_argument("--store-dir", default=STORE_DIR)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=5)
+    args = parser.parse_args()
+
+    stats = update_embedding_store(
+        property_data(),
+        store_dir=args.store_dir,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        max_retries=args.max_retries,
+    )
+    print(
+        f"{stats['total']} listings: {stats['embedded']} embedded in "
+        f"{stats['batches']} batches, {stats['reused']} reused, "
+        f"{stats['removed']} removed "
+        f"({stats['embed_seconds']:.2f}s embedding, "
+        f"{stats['total_seconds']:.2f}s total)"
+    )
+    if stats["unhashed"]:
+        print(
+            "The store had no content hashes (compiled from the CSV), so every "
+            "listing was embedded; later runs only embed changed listings"
+        )
@@ -0,0 +1,79 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app import metrics
+
+
+class IntentBatcher:
+    """Collects concurrent classification requests into padded batches.
+
+    ``classify_batch`` takes a list of texts and returns one label per text
+    (see ``utils.classify_intents``). A background thread waits for the
+    first request, keeps collecting for up to ``max_wait_ms`` or until
+    ``max_batch_size`` requests are queued, and runs one forward pass for
+    all of them.
+    """
+
+    def __init__(self, classify_batch, max_batch_size=16, max_wait_ms=5):
+        self.classify_batch = classify_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._requests = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="intent-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, text):
+        self._start()
+        future = Future()
+        self._requests.put((text, future))
+        return future
+
+    def classify(self, text, timeout=None):
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                with metrics.stage_timer("classify_batch"):
+                    labels = self.classify_batch(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), label in zip(batch, labels):
+                future.set_result(label)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from app import metrics
+
+DATASET_PATH = "data/contact_agent_dataset.csv"
+LINEAR_MODEL_PATH = "results/intent-linear.joblib"
+
+
+class LinearIntentModel:
+    """TF-IDF (word and character n-grams) + logistic regression classifier.
+
+    ``preprocess`` is applied to every text before vectorizing, the same
+    cleaning the transformer model sees (``utils.clean_text``).
+    """
+
+    def __init__(self, pipeline, preprocess=None):
+        self.pipeline = pipeline
+        self.preprocess = preprocess or (lambda text: text)
+
+    @classmethod
+    def train(cls, texts, labels, preprocess=None):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import FeatureUnion, make_pipeline
+
+        preprocess = preprocess or (lambda text: text)
+        features = FeatureUnion(
+            [
+                ("words", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)),
+                (
+                    "chars",
+                    TfidfVectorizer(
+                        analyzer="char_wb", ngram_range=(2, 5), sublinear_tf=True
+                    ),
+                ),
+            ]
+        )
+        pipeline = make_pipeline(features, LogisticRegression(C=10, max_iter=1000))
+        pipeline.fit([preprocess(text) for text in texts], labels)
+        return cls(pipeline, preprocess)
+
+    # Label and probability of the most likely class for each text
+    def predict(self, texts):
+        probabilities = self.pipeline.predict_proba(
+            [self.preprocess(text) for text in texts]
+        )
+        classes = self.pipeline.classes_
+        best = probabilities.argmax(axis=1)
+        return [
+            (classes[i], float(probabilities[row, i])) for row, i in enumerate(best)
+        ]
+
+    def save(self, path):
+        import joblib
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        joblib.dump(self.pipeline, path)
+
+    @classmethod
+    def load(cls, path, preprocess=None):
+        import joblib
+
+        return cls(joblib.load(path), preprocess)
+
+
+# Load the saved linear model, training it from the labelled dataset (and
+# saving it) the first time
+def load_or_train_linear_model(
+    preprocess=None, model_path=LINEAR_MODEL_PATH, dataset_path=DATASET_PATH
+):
+    if os.path.exists(model_path):
+        return LinearIntentModel.load(model_path, preprocess)
+    import pandas as pd
+
+    dataset = pd.read_csv(dataset_path)
+    model = LinearIntentModel.train(
+        dataset["query"].tolist(), dataset["label"].tolist(), preprocess
+    )
+    model.save(model_path)
+    return model
+
+
+class IntentCascade:
+    """Cheapest classifier first, the transformer only when needed.
+
+    1. memo: exact match on the normalized text of a message seen before
+    2. linear: TF-IDF + logistic regression, accepted when its probability
+       is at least ``threshold``
+    3. full: ``classify_full`` (the RoBERTa model)
+
+    Each tier's hits and latency are recorded.
+    """
+
+    TIERS = ("memo", "linear", "full")
+
+    def __init__(
+        self, linear_model, classify_full, normalize=None, threshold=0.9, memo_size=4096
+    ):
+        self.linear_model = linear_model
+        self.classify_full = classify_full
+        self.normalize = normalize or (lambda text: " ".join(text.lower().split()))
+        self.threshold = threshold
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {tier: 0 for tier in self.TIERS}
+
+    def _remember(self, key, label):
+        with self._lock:
+            self._memo[key] = label
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def _hit(self, tier, start):
+        metrics.record(f"intent_{tier}", time.perf_counter() - start)
+        metrics.increment("intent_tier_total", tier=tier)
+        with self._lock:
+            self.hits[tier] += 1
+
+    # Returns (label, tier that decided it)
+    def classify_with_tier(self, text):
+        start = time.perf_counter()
+        key = self.normalize(text)
+        with self._lock:
+            label = self._memo.get(key)
+            if label is not None:
+                self._memo.move_to_end(key)
+        if label is not None:
+            self._hit("memo", start)
+            return label, "memo"
+
+        label, probability = self.linear_model.predict([text])[0]
+        if probability >= self.threshold:
+            tier = "linear"
+        else:
+            label = self.classify_full(text)
+            tier = "full"
+        self._remember(key, label)
+        self._hit(tier, start)
+        return label, tier
+
+    def classify(self, text):
+        return self.classify_with_tier(text)[0]
+
+    def stats(self):
+        total = sum(self.hits.values())
+        return {
+            "hits": dict(self.hits),
+            "hit_rates": {
+                tier: count / total if total else 0.0
+                for tier, count in self.hits.items()
+            },
+            "memo_size": len(self._memo),
+        }
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.intent_cascade  (retrains the linear model)
+    from app.utils import clean_text
+
+    if os.path.exists(LINEAR_MODEL_PATH):
+        os.remove(LINEAR_MODEL_PATH)
+    load_or_train_linear_model(clean_text)
+    print(f"Linear intent model saved to {LINEAR_MODEL_PATH}")
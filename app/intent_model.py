@@ -0,0 +1,158 @@
+import argparse
+import os
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+# Exported artifacts are written next to the fine-tuned model
+TORCHSCRIPT_FILE = "intent_model.torchscript.pt"
+ONNX_FILE = "intent_model.onnx"
+ONNX_INT8_FILE = "intent_model.int8.onnx"
+
+RUNTIMES = ("pytorch", "quantized", "torchscript", "onnx", "onnx-int8")
+
+
+def _require_artifact(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{path} not found. Export it with `python app/intent_model.py`"
+        )
+    return path
+
+
+class _ModelOutput:
+    def __init__(self, logits):
+        self.logits = logits
+
+
+# Example input used to trace the graph; axes stay dynamic for ONNX
+def _example_inputs(tokenizer):
+    inputs = tokenizer(
+        ["quiero hablar con un agente", "hola"],
+        return_tensors="pt",
+        padding=True,
+        truncation=True,
+    )
+    return inputs["input_ids"], inputs["attention_mask"]
+
+
+def export_torchscript(model_path, tokenizer):
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_path, torchscript=True
+    )
+    model.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, _example_inputs(tokenizer))
+    output_path = os.path.join(model_path, TORCHSCRIPT_FILE)
+    torch.jit.save(traced, output_path)
+    return output_path
+
+
+def export_onnx(model_path, tokenizer, quantize=True):
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    output_path = os.path.join(model_path, ONNX_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            _example_inputs(tokenizer),
+            output_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=14,
+        )
+    paths = [output_path]
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(model_path, ONNX_INT8_FILE)
+        quantize_dynamic(output_path, int8_path, weight_type=QuantType.QInt8)
+        paths.append(int8_path)
+    return paths
+
+
+class TorchScriptIntentModel:
+    def __init__(self, path):
+        self.module = torch.jit.load(_require_artifact(path), map_location="cpu")
+        self.module.eval()
+
+    def __call__(self, input_ids, attention_mask, **kwargs):
+        return _ModelOutput(self.module(input_ids, attention_mask)[0])
+
+    def eval(self):
+        return self
+
+
+class OnnxIntentModel:
+    def __init__(self, path, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            _require_artifact(path), options, providers=["CPUExecutionProvider"]
+        )
+
+    def __call__(self, input_ids, attention_mask, **kwargs):
+        logits = self.session.run(
+            ["logits"],
+            {
+                "input_ids": input_ids.numpy(),
+                "attention_mask": attention_mask.numpy(),
+            },
+        )[0]
+        return _ModelOutput(torch.from_numpy(logits))
+
+    def eval(self):
+        return self
+
+
+# Load the intent classifier for the given runtime. Every runtime returns an
+# object called as model(**inputs) with a .logits tensor, like the HF model.
+def load_intent_model(model_path, runtime="pytorch"):
+    if runtime == "pytorch":
+        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    elif runtime == "quantized":
+        # Dynamic int8 quantization of the Linear layers, done at load time
+        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        model.eval()
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    elif runtime == "torchscript":
+        model = TorchScriptIntentModel(os.path.join(model_path, TORCHSCRIPT_FILE))
+    elif runtime == "onnx":
+        model = OnnxIntentModel(os.path.join(model_path, ONNX_FILE))
+    elif runtime == "onnx-int8":
+        model = OnnxIntentModel(os.path.join(model_path, ONNX_INT8_FILE))
+    else:
+        raise ValueError(
+            f"Unknown intent model runtime '{runtime}'. "
+            f"Choose one of: {', '.join(RUNTIMES)}"
+        )
+    model.eval()
+    return model
+
+
+if __name__ == "__main__":
+    # Usage: python app/intent_model.py --model ./results/model-6
+    parser = argparse.ArgumentParser(description="Export the intent classifier")
+    parser.add_argument("--model", default="./results/model-6")
+    parser.add_argument("--tokenizer", default="roberta-base")
+    parser.add_argument(
+        "--format", choices=["torchscript", "onnx", "all"], default="all"
+    )
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    if args.format in ("torchscript", "all"):
+        print(f"Saved {export_torchscript(args.model, tokenizer)}")
+    if args.format in ("onnx", "all"):
+        for path in export_onnx(args.model, tokenizer, quantize=not args.no_quantize):
+            print(f"Saved {path}")
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+import torch
+from datasets import Dataset
+from transformers import (
+    DataCollatorWithPadding,
+    Trainer,
+    TrainerCallback,
+    TrainingArguments,
+    default_data_collator,
+)
+
+# Shared by classifier.py (training) and classifier_test.py (evaluation).
+# Both run from the app/ directory, so this module only imports packages.
+
+LABEL_MAPPING = {"contact agent": 0, "other": 1}
+MAX_LENGTH = 50
+CACHE_DIR = "./cache/tokenized"
+
+
+# Use every core for intra-op parallelism (matrix multiplies) on CPU
+def configure_cpu_threads(num_threads=None):
+    num_threads = num_threads or os.cpu_count() or 1
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(min(num_threads, 4))
+    except RuntimeError:
+        # Can only be set before the first parallel operation
+        pass
+    return num_threads
+
+
+# Read a labelled CSV (query, label) with numeric labels and cleaned text
+def load_labelled_csv(path, preprocess):
+    df = pd.read_csv(path)
+    df["label"] = df["label"].map(LABEL_MAPPING)
+    df["query"] = df["query"].map(preprocess)
+    return df
+
+
+# Changes whenever the texts, labels, tokenizer or padding change
+def dataset_fingerprint(df, tokenizer, max_length=MAX_LENGTH, pad_to_max_length=False):
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            {
+                "tokenizer": type(tokenizer).__name__,
+                "name": tokenizer.name_or_path,
+                "vocab_size": len(tokenizer),
+                "max_length": max_length,
+                "pad_to_max_length": pad_to_max_length,
+            },
+            sort_keys=True,
+        ).encode("utf-8")
+    )
+    if tokenizer.is_fast:
+        # Vocabulary, merges and normalization rules
+        digest.update(tokenizer.backend_tokenizer.to_str().encode("utf-8"))
+    digest.update(
+        pd.util.hash_pandas_object(df[["query", "label"]], index=False)
+        .to_numpy()
+        .tobytes()
+    )
+    return digest.hexdigest()[:16]
+
+
+def tokenize_dataset(
+    df, tokenizer, max_length=MAX_LENGTH, pad_to_max_length=False, cache_dir=CACHE_DIR
+):
+    """Tokenized dataset for ``df``, loaded from ``cache_dir`` when possible.
+
+    Without ``pad_to_max_length`` sequences keep their own length and are
+    padded per batch by the data collator. A ``length`` column is stored for
+    length-grouped batching.
+    """
+    key = dataset_fingerprint(df, tokenizer, max_length, pad_to_max_length)
+    path = os.path.join(cache_dir, key)
+    if os.path.exists(path):
+        return Dataset.load_from_disk(path)
+
+    def tokenize(examples):
+        inputs = tokenizer(
+            examples["query"],
+            padding="max_length" if pad_to_max_length else False,
+            truncation=True,
+            max_length=max_length,
+        )
+        inputs["length"] = [len(ids) for ids in inputs["input_ids"]]
+        return inputs
+
+    dataset = Dataset.from_pandas(df[["query", "label"]], preserve_index=False)
+    dataset = dataset.map(tokenize, batched=True, remove_columns=["query"])
+
+    # Write to a temporary directory first so a crash never leaves a
+    # partial dataset under the final key
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    dataset.save_to_disk(tmp_path)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return Dataset.load_from_disk(path)
+
+
+# Records the wall time of every epoch
+class EpochTimer(TrainerCallback):
+    def __init__(self):
+        self.epoch_times = []
+        self._start = None
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        self.epoch_times.append(time.perf_counter() - self._start)
+
+
+def build_trainer(
+    model,
+    tokenizer,
+    args,
+    train_dataset=None,
+    eval_dataset=None,
+    dynamic_padding=True,
+    callbacks=None,
+):
+    """Trainer that pads each batch to its longest sequence.
+
+    With ``dynamic_padding=False`` the datasets must already be padded to a
+    fixed length (``pad_to_max_length=True``), as the original scripts did.
+    """
+    if dynamic_padding:
+        data_collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8)
+    else:
+        data_collator = default_data_collator
+    return Trainer(
+        model=model,
+        args=args,
+        train_dataset=train_dataset,
+        eval_dataset=eval_dataset,
+        data_collator=data_collator,
+        callbacks=callbacks,
+    )
+
+
+def training_arguments(output_dir, dynamic_padding=True, **overrides):
+    settings = dict(
+        output_dir=output_dir,
+        eval_strategy="steps",
+        eval_steps=20,
+        save_strategy="steps",
+        learning_rate=5e-6,
+        lr_scheduler_type="linear",
+        warmup_steps=50,
+        num_train_epochs=5,
+        weight_decay=0.05,
+        per_device_train_batch_size=8,
+        # Evaluation keeps no gradients, so larger batches are cheap
+        per_device_eval_batch_size=64 if dynamic_padding else 8,
+        logging_dir="./logs",
+        logging_steps=20,
+        load_best_model_at_end=True,
+        metric_for_best_model="eval_loss",
+        greater_is_better=False,
+        # Batches of similar lengths need less padding
+        group_by_length=dynamic_padding,
+        dataloader_num_workers=0,
+    )
+    settings.update(overrides)
+    return TrainingArguments(**settings)
+
+
+# Predicted label ids for a tokenized dataset, in the dataset's order, and
+# the runtime/throughput metrics. Sequences are predicted sorted by length
+# so each batch pads as little as possible.
+def predict(trainer, dataset):
+    order = None
+    if "length" in dataset.column_names:
+        order = np.argsort(dataset["length"], kind="stable")
+        dataset = dataset.select(order)
+    output = trainer.predict(dataset)
+    predicted_labels = output.predictions.argmax(axis=-1)
+    if order is not None:
+        restored = np.empty_like(predicted_labels)
+        restored[order] = predicted_labels
+        predicted_labels = restored
+    return predicted_labels, output.metrics
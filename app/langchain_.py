@@ -7,60 +7,50 @@ from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.runnables import RunnableLambda
 from langchain_core.documents import Document
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
 import os
 import sys
+import threading
 
 # Add the parent directory to the sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import config
+from app.metrics import run_listener
+from app.context_builder import ContextBuilder, get_token_counter
+from app.sessions import SessionChatMessageHistory, get_session_backend
 
 # Ensure the OpenAI API key is set as an environment variable
 openai_api_key = config.OPENAI_API_KEY
 
-# Initialize OpenAI LLM with LangChain
-llm = ChatOpenAI(api_key=openai_api_key, model_name="gpt-4o-mini")
-print("Working LLM" if llm else "no LLM")
+# Initialize OpenAI LLM with LangChain on first use, not at import
+_llm = None
+_llm_lock = threading.Lock()
 
-# Session history storage
-store = {}
 
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = ChatOpenAI(api_key=openai_api_key, model_name="gpt-4o-mini")
+                print("Working LLM" if _llm else "no LLM")
+    return _llm
 
+
+# Session history lives in the shared, bounded session backend
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    return store[session_id]
+    return SessionChatMessageHistory(get_session_backend(), session_id)
 
 
-def query_llm(properties, input, session_id):
-    # Turns properties into runnable list of Documents
-    runnable_listings = RunnableLambda(
-        lambda *args: [
-            Document(page_content=listing, metadata={"source": "local"})
-            for listing in properties
-        ]
-    )
-    # Contextualize question
-    contextualize_q_system_prompt = """
+# Contextualize question
+CONTEXTUALIZE_Q_SYSTEM_PROMPT = """
     Dada una historia de chat y la última pregunta del usuario,
     que podría hacer referencia al contexto en la historia del chat,
     formula una pregunta independiente que pueda entenderse
     sin la historia del chat. NO respondas la pregunta,
     solo reformúlala si es necesario y, de lo contrario, devuélvela tal como está.
     """
-    contextualize_q_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", contextualize_q_system_prompt),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}"),
-        ]
-    )
-
-    history_aware_retriever = create_history_aware_retriever(
-        llm=llm, retriever=runnable_listings, prompt=contextualize_q_prompt
-    )
 
-    template = """
+QA_SYSTEM_PROMPT = """
     Eres un asistente experto de bienes raíces. Te llamas Yobot. Usa el contexto obtenido para responder preguntas.
 
     Intenta generar respuestas dinámicas y personalizadas para cada pregunta. Si la pregunta es acerca de inmobiliaria, responde con información relevante sobre las propiedades.
@@ -81,18 +71,82 @@ def query_llm(properties, input, session_id):
     
     {context}
     """
+
+
+# Turns the listings passed in the run config into a list of Documents
+def _listings_to_documents(_inputs, config):
+    properties = config.get("configurable", {}).get("properties") or []
+    return _to_documents(properties)
+
+
+def _to_documents(listings):
+    return [
+        Document(page_content=listing, metadata={"source": "local"})
+        for listing in listings
+    ]
+
+
+# Trims the retrieved listings and the chat history to the context
+# builder's token budget and logs the prompt size
+def _fit_context(inputs, context_builder):
+    context, history, stats = context_builder.fit(
+        inputs["context"], inputs.get("chat_history", [])
+    )
+    count_tokens = context_builder.count_tokens
+    system_tokens = count_tokens(QA_SYSTEM_PROMPT.replace("{context}", ""))
+    input_tokens = count_tokens(inputs["input"])
+    total = (
+        system_tokens + stats["listing_tokens"] + stats["history_tokens"] + input_tokens
+    )
+    print(
+        f"Prompt tokens: {total} (system {system_tokens}, "
+        f"{stats['listings']} listings {stats['listing_tokens']}, "
+        f"{stats['history_messages']} history messages {stats['history_tokens']}, "
+        f"input {input_tokens})"
+    )
+    return {**inputs, "context": context, "chat_history": history}
+
+
+# Builds the RAG chain. Without search_fn the listings are searched by the
+# caller before the chain runs, so rephrasing the question against the chat
+# history could not change them and that LLM call is skipped entirely. With
+# search_fn, the history-aware retriever rephrases the question and the
+# rephrased question drives the property search. A context_builder fits the
+# listings and history into its token budget before the answer is generated.
+def build_rag_chain(llm, search_fn=None, context_builder=None):
+    if search_fn is None:
+        retriever = RunnableLambda(_listings_to_documents)
+    else:
+        contextualize_q_prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", CONTEXTUALIZE_Q_SYSTEM_PROMPT),
+                MessagesPlaceholder("chat_history"),
+                ("human", "{input}"),
+            ]
+        )
+        retriever = create_history_aware_retriever(
+            llm=llm.with_listeners(on_end=run_listener("contextualize")),
+            retriever=RunnableLambda(lambda query: _to_documents(search_fn(query))),
+            prompt=contextualize_q_prompt,
+        )
+
     prompt = ChatPromptTemplate.from_messages(
         [
-            ("system", template),
+            ("system", QA_SYSTEM_PROMPT),
             MessagesPlaceholder("chat_history"),
             ("human", "{input}"),
         ]
     )
 
     # Initialize the LLMChain with the prompt and LLM
-    chain = create_stuff_documents_chain(llm, prompt)
-    rag_chain = create_retrieval_chain(history_aware_retriever, chain)
-    chain_with_message_history = RunnableWithMessageHistory(
+    chain = create_stuff_documents_chain(
+        llm.with_listeners(on_end=run_listener("generate")), prompt
+    )
+    if context_builder is not None:
+        fit = RunnableLambda(lambda inputs: _fit_context(inputs, context_builder))
+        chain = fit | chain
+    rag_chain = create_retrieval_chain(retriever, chain)
+    return RunnableWithMessageHistory(
         rag_chain,
         get_session_history,
         input_messages_key="input",
@@ -100,10 +154,64 @@ def query_llm(properties, input, session_id):
         output_messages_key="answer",
     )
 
+
+# The chain only depends on the LLM, so it is built once and reused; the
+# retrieved listings for each message travel in the run config
+_rag_chain = None
+_rag_chain_lock = threading.Lock()
+
+
+def get_rag_chain():
+    global _rag_chain
+    if _rag_chain is None:
+        with _rag_chain_lock:
+            if _rag_chain is None:
+                _rag_chain = _create_rag_chain()
+    return _rag_chain
+
+
+def _search_listings(query):
+    from app.utils import (
+        load_properties_with_embeddings,
+        search_properties_with_embeddings,
+    )
+
+    return search_properties_with_embeddings(load_properties_with_embeddings(), query)
+
+
+def _create_rag_chain():
+    # Contextualized mode searches with the rephrased question itself
+    search_fn = None
+    if config.RETRIEVAL_MODE == "contextualized":
+        search_fn = _search_listings
+
+    context_builder = ContextBuilder(
+        max_tokens=config.CONTEXT_MAX_TOKENS,
+        description_tokens=config.LISTING_DESCRIPTION_TOKENS,
+        count_tokens=get_token_counter(config.TOKEN_COUNTER),
+    )
+    return build_rag_chain(
+        get_llm(), search_fn=search_fn, context_builder=context_builder
+    )
+
+
+# Pass properties=None when RETRIEVAL_MODE is "contextualized"; the chain
+# then searches with the history-aware question itself
+def query_llm(properties, input, session_id):
     # Run the chain with the provided inputs
-    response = chain_with_message_history.invoke(
+    response = get_rag_chain().invoke(
         {"input": input},
-        config={"configurable": {"session_id": session_id}},
+        config={"configurable": {"session_id": session_id, "properties": properties}},
     )["answer"]
 
     return response
+
+
+# Stream the answer as text deltas while it is being generated
+def stream_llm(properties, input, session_id):
+    for chunk in get_rag_chain().stream(
+        {"input": input},
+        config={"configurable": {"session_id": session_id, "properties": properties}},
+    ):
+        if chunk.get("answer"):
+            yield chunk["answer"]
@@ -0,0 +1,118 @@
+import math
+import re
+from collections import Counter
+import numpy as np
+from app.vector_index import top_k
+
+
+# "ID:123", "id 123" or "propiedad 123" become the single token "id123",
+# which is how listings index their id
+def mark_property_ids(text):
+    return re.sub(r"\b(?:id|propiedad)\s*:?\s*(\d+)\b", r" id\1 ", text, flags=re.I)
+
+
+class BM25Index:
+    """Okapi BM25 over tokenized documents, stored as term -> postings arrays.
+
+    Each term's postings (document rows and precomputed BM25 weights) are
+    contiguous slices of two arrays, so scoring a query is one vectorized
+    add per query term.
+    """
+
+    def __init__(self, documents, tokenize, k1=1.5, b=0.75):
+        self.tokenize = tokenize
+        self.size = len(documents)
+        self.vocabulary = {}
+        term_ids, doc_ids, frequencies = [], [], []
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for row, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            lengths[row] = sum(counts.values())
+            for term, frequency in counts.items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(row)
+                frequencies.append(frequency)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        frequencies = np.asarray(frequencies, dtype=np.float32)
+        order = np.argsort(term_ids, kind="stable")
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.offsets = np.concatenate(([0], np.cumsum(document_frequency)))
+        self.idf = np.log(
+            1 + (self.size - document_frequency + 0.5) / (document_frequency + 0.5)
+        ).astype(np.float32)
+        # Weight of a term never seen in the catalog
+        self.unknown_idf = math.log(1 + (self.size + 0.5) / 0.5)
+
+        average_length = lengths.mean() if self.size else 1.0
+        norm = k1 * (1 - b + b * lengths[doc_ids] / (average_length or 1.0))
+        weights = self.idf[term_ids] * frequencies * (k1 + 1) / (frequencies + norm)
+        self.postings = doc_ids[order]
+        self.weights = weights[order].astype(np.float32)
+
+    def __len__(self):
+        return self.size
+
+    def _postings(self, term_id):
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.postings[start:end], self.weights[start:end]
+
+    def query_terms(self, query):
+        return list(dict.fromkeys(self.tokenize(query)))
+
+    # BM25 score of every document for the query terms
+    def scores(self, terms):
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in terms:
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                rows, weights = self._postings(term_id)
+                # A term appears once in its postings, so rows are unique
+                scores[rows] += weights
+        return scores
+
+    # Share of the query's idf mass that each of `rows` contains; 1.0 means
+    # the document has every query term
+    def coverage(self, terms, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        matched = np.zeros(len(rows), dtype=np.float32)
+        total = 0.0
+        for term in terms:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                total += self.unknown_idf
+                continue
+            idf = float(self.idf[term_id])
+            total += idf
+            matched += idf * np.isin(rows, self._postings(term_id)[0])
+        return matched / total if total else matched
+
+    # Top k rows by BM25 score, optionally restricted to `rows`; documents
+    # without any query term are never returned
+    def search(self, terms, k=5, rows=None):
+        scores = self.scores(terms)
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            best = top_k(scores[rows], k)
+            found, found_scores = rows[best], scores[rows][best]
+        else:
+            found = top_k(scores, k)
+            found_scores = scores[found]
+        keep = found_scores > 0
+        return found[keep], found_scores[keep]
+
+
+# Convex combination of cosine similarity and max-normalized BM25 score over
+# the union of both candidate sets. `cosine(rows)` returns exact cosine
+# similarities for the given rows. Returns the top k rows.
+def fuse_scores(vector_rows, lexical_rows, lexical_scores, cosine, alpha=0.7, k=5):
+    candidates = np.union1d(vector_rows, lexical_rows).astype(np.int64)
+    if len(candidates) == 0:
+        return candidates
+    lexical = np.zeros(len(candidates), dtype=np.float32)
+    if len(lexical_rows):
+        positions = np.searchsorted(candidates, lexical_rows)
+        lexical[positions] = lexical_scores / (np.max(lexical_scores) or 1.0)
+    fused = alpha * cosine(candidates) + (1 - alpha) * lexical
+    return candidates[top_k(fused, k)]
@@ -0,0 +1,232 @@
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from app import metrics
+from app.worker import QueueFull
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import config
+
+
+class SendError(Exception):
+    """A failed send; ``retryable`` for rate limits (429) and server errors."""
+
+    def __init__(self, message, status=None, retryable=False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+class SentMessage:
+    def __init__(self, sid, to, body):
+        self.sid = sid
+        self.to = to
+        self.body = body
+
+
+class TwilioTransport:
+    """Sends through one Twilio client whose HTTP session is pooled and shared."""
+
+    def __init__(self, account_sid, auth_token, from_, pool_size=10, timeout=10):
+        from requests.adapters import HTTPAdapter
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+
+        http_client = TwilioHttpClient(pool_connections=True, timeout=timeout)
+        # Keep up to pool_size connections alive, one per concurrent sender
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        http_client.session.mount("https://", adapter)
+        self.client = Client(account_sid, auth_token, http_client=http_client)
+        self.from_ = from_
+
+    def send(self, to, body):
+        from twilio.base.exceptions import TwilioRestException
+
+        try:
+            message = self.client.messages.create(from_=self.from_, body=body, to=to)
+        except TwilioRestException as e:
+            raise SendError(
+                str(e), status=e.status, retryable=e.status == 429 or e.status >= 500
+            ) from e
+        except OSError as e:
+            # Connection errors and timeouts
+            raise SendError(str(e), retryable=True) from e
+        return SentMessage(message.sid, to, message.body)
+
+
+class StubTransport:
+    """Local transport that records messages instead of calling Twilio.
+
+    ``latency`` (seconds) is slept per send, and ``fail_first`` sends raise a
+    retryable 429 before sends start succeeding, to exercise the retry path.
+    """
+
+    def __init__(self, latency=0.0, fail_first=0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.sent = []
+        self._lock = threading.Lock()
+        self._attempts = 0
+
+    def send(self, to, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._attempts += 1
+            if self._attempts <= self.fail_first:
+                raise SendError("Too Many Requests", status=429, retryable=True)
+            message = SentMessage(f"SM{len(self.sent):032d}", to, body)
+            self.sent.append(message)
+        return message
+
+
+class Messenger:
+    """Outbound WhatsApp messages with retries and bounded concurrency.
+
+    ``send`` delivers in the caller's thread and ``submit`` enqueues the
+    message for a pool of ``workers`` threads; either way at most
+    ``max_concurrency`` requests are in flight. Retryable failures (429,
+    5xx, connection errors) are retried with exponential backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        transport,
+        workers=4,
+        max_queue=100,
+        max_concurrency=8,
+        max_retries=3,
+        base_delay=0.5,
+    ):
+        self.transport = transport
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def _send_once(self, to, body):
+        with self._slots:
+            with metrics.stage_timer("send"):
+                return self.transport.send(to, body)
+
+    # Returns the sent message, or None if it could not be delivered
+    def send(self, to, body):
+        for attempt in range(self.max_retries + 1):
+            try:
+                message = self._send_once(to, body)
+                with self._lock:
+                    self.sent += 1
+                metrics.increment("messages_total", result="sent")
+                return message
+            except SendError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    error = e
+                    break
+                with self._lock:
+                    self.retries += 1
+                metrics.increment("send_retries_total", status=e.status or "error")
+                # Rate limited: back off harder than for server errors
+                factor = 4 if e.status == 429 else 1
+                time.sleep(
+                    self.base_delay * factor * 2**attempt * random.uniform(0.5, 1.0)
+                )
+            except Exception as e:
+                error = e
+                break
+        with self._lock:
+            self.failed += 1
+        metrics.increment("messages_total", result="failed")
+        print(f"Failed to send message to {to}: {error}")
+        return None
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"messenger-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    # Queue a message for the background workers; the Future resolves to the
+    # sent message (or None). Raises QueueFull when the queue is full.
+    def submit(self, to, body):
+        self.start()
+        future = Future()
+        try:
+            self._queue.put_nowait((time.perf_counter(), to, body, future))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(f"Send queue is full, dropping message to {to}")
+        return future
+
+    def _run(self):
+        while True:
+            enqueued, to, body, future = self._queue.get()
+            metrics.record("send_queue_wait", time.perf_counter() - enqueued)
+            try:
+                future.set_result(self.send(to, body))
+            finally:
+                self._queue.task_done()
+
+    # Block until every queued message has been sent
+    def join(self):
+        self._queue.join()
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "workers": self.workers,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rejected": self.rejected,
+        }
+
+
+def create_transport():
+    if config.MESSAGING_TRANSPORT == "stub":
+        return StubTransport()
+    if config.MESSAGING_TRANSPORT == "twilio":
+        return TwilioTransport(
+            config.TWILIO_ACCOUNT_SID,
+            config.TWILIO_AUTH_TOKEN,
+            config.TWILIO_SANDBOX_NUMBER,
+            pool_size=config.SEND_MAX_CONCURRENCY,
+        )
+    raise ValueError(f"Unknown messaging transport '{config.MESSAGING_TRANSPORT}'")
+
+
+# Shared by routes (replies) and utils (agent notifications)
+_messenger = None
+_messenger_lock = threading.Lock()
+
+
+def get_messenger():
+    global _messenger
+    if _messenger is None:
+        with _messenger_lock:
+            if _messenger is None:
+                _messenger = Messenger(
+                    create_transport(),
+                    workers=config.SEND_WORKERS,
+                    max_queue=config.SEND_QUEUE_SIZE,
+                    max_concurrency=config.SEND_MAX_CONCURRENCY,
+                    max_retries=config.SEND_MAX_RETRIES,
+                )
+    return _messenger
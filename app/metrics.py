@@ -0,0 +1,206 @@
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Keep the most recent samples per stage so percentiles track current load
+MAX_SAMPLES = 1000
+
+# Upper bounds (seconds) of the cumulative histogram buckets per stage
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_counts = defaultdict(int)
+_totals = defaultdict(float)
+_buckets = defaultdict(lambda: [0] * len(BUCKETS))
+_counters = defaultdict(int)
+
+# Stages recorded by the request currently traced on this thread
+_local = threading.local()
+
+
+# Record how long a pipeline stage took, in seconds
+def record(stage, seconds):
+    with _lock:
+        _samples[stage].append(seconds)
+        _counts[stage] += 1
+        _totals[stage] += seconds
+        bucket = bisect_left(BUCKETS, seconds)
+        if bucket < len(BUCKETS):
+            _buckets[stage][bucket] += 1
+    trace = getattr(_local, "stages", None)
+    if trace is not None:
+        trace.append((stage, seconds))
+
+
+@contextmanager
+def stage_timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+# Decorator form of stage_timer
+def timed(stage):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Listener for Runnable.with_listeners that records the run's duration
+def run_listener(stage):
+    def on_end(run):
+        if run.end_time and run.start_time:
+            record(stage, (run.end_time - run.start_time).total_seconds())
+
+    return on_end
+
+
+# Count an event, e.g. increment("intents_total", intent="other")
+def increment(name, amount=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += amount
+
+
+_request_numbers = itertools.count(1)
+
+
+# Time a whole request under `stage` and collect the stages it records. A
+# request slower than slow_ms is logged with its per-stage breakdown. With
+# profile_every=N, one request in N also runs under cProfile and, if it is
+# slow, its stats are written to profile_dir and the top functions logged.
+@contextmanager
+def traced_request(stage="request", slow_ms=None, profile_every=0, profile_dir=None):
+    profiler = None
+    if profile_every and next(_request_numbers) % profile_every == 0:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (e.g. a concurrent request)
+            profiler = None
+
+    _local.stages = stages = []
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _local.stages = None
+        if profiler is not None:
+            profiler.disable()
+        record(stage, elapsed)
+
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            breakdown = ", ".join(
+                f"{name} {seconds * 1000:.0f}ms" for name, seconds in stages
+            )
+            print(f"Slow {stage}: {elapsed * 1000:.0f}ms ({breakdown})")
+            if profiler is not None:
+                _dump_profile(profiler, stage, profile_dir)
+
+
+def _dump_profile(profiler, stage, profile_dir):
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f"{stage}-{time.time():.0f}.prof")
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}")
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(15)
+    print(output.getvalue())
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# Per-stage count, mean and recent percentiles in milliseconds
+def snapshot():
+    with _lock:
+        stages = {stage: sorted(samples) for stage, samples in _samples.items()}
+        counts = dict(_counts)
+        totals = dict(_totals)
+    summary = {}
+    for stage, values in stages.items():
+        if not values:
+            continue
+        summary[stage] = {
+            "count": counts[stage],
+            "mean_ms": totals[stage] / counts[stage] * 1000,
+            "p50_ms": _percentile(values, 0.50) * 1000,
+            "p95_ms": _percentile(values, 0.95) * 1000,
+            "p99_ms": _percentile(values, 0.99) * 1000,
+        }
+    return summary
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+# Stage histograms and counters in the Prometheus text exposition format.
+# Each worker process keeps its own metrics.
+def render_prometheus(prefix="chatbot"):
+    with _lock:
+        counts = dict(_counts)
+        totals = dict(_totals)
+        buckets = {stage: list(values) for stage, values in _buckets.items()}
+        event_counters = dict(_counters)
+
+    lines = [
+        f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.",
+        f"# TYPE {prefix}_stage_seconds histogram",
+    ]
+    for stage in sorted(counts):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, buckets.get(stage, [0] * len(BUCKETS))):
+            cumulative += count
+            labels = _labels((("stage", stage), ("le", bound)))
+            lines.append(f"{prefix}_stage_seconds_bucket{labels} {cumulative}")
+        labels = _labels((("stage", stage), ("le", "+Inf")))
+        lines.append(f"{prefix}_stage_seconds_bucket{labels} {counts[stage]}")
+        labels = _labels((("stage", stage),))
+        lines.append(f"{prefix}_stage_seconds_sum{labels} {totals[stage]}")
+        lines.append(f"{prefix}_stage_seconds_count{labels} {counts[stage]}")
+
+    names = sorted({name for name, _ in event_counters})
+    for name in names:
+        lines.append(f"# TYPE {prefix}_{name} counter")
+        for (counter, labels), value in sorted(event_counters.items()):
+            if counter == name:
+                lines.append(f"{prefix}_{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
+        _totals.clear()
+        _buckets.clear()
+        _counters.clear()
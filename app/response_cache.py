@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app import metrics
+
+
+class ResponseCache:
+    """Semantic cache of LLM answers for first messages of a conversation.
+
+    An entry is keyed on the query embedding and the set of listing ids that
+    were retrieved for it. A lookup only considers entries with exactly the
+    same listings and returns the closest one whose cosine similarity is at
+    least ``threshold``, so "qué casas tienen en venta" can reuse the answer
+    to "que casas tienen a la venta" but never an answer about other
+    listings. Entries are bounded by count (LRU) and age (TTL), and the whole
+    cache is dropped when ``version`` (catalog/store version) changes.
+    """
+
+    def __init__(self, threshold=0.95, max_size=1000, ttl=3600):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = None
+        self._entries = OrderedDict()
+        self._by_ids = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._by_ids.clear()
+            self.version = version
+
+    def _remove(self, key):
+        ids = self._entries.pop(key)[0]
+        keys = self._by_ids[ids]
+        keys.discard(key)
+        if not keys:
+            del self._by_ids[ids]
+
+    def get(self, embedding, ids, version=None):
+        ids = frozenset(ids)
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            best_key, best_score = None, self.threshold
+            for key in list(self._by_ids.get(ids, ())):
+                _, vector, _, created, _ = self._entries[key]
+                if self.ttl and now - created > self.ttl:
+                    self._remove(key)
+                    continue
+                score = float(vector @ query)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                metrics.increment(
+                    "cache_lookups_total", cache="response", result="miss"
+                )
+                return None
+            self._entries.move_to_end(best_key)
+            _, _, answer, _, seconds = self._entries[best_key]
+            self.hits += 1
+            self.saved_seconds += seconds
+            metrics.increment("cache_lookups_total", cache="response", result="hit")
+            return answer
+
+    # `seconds` is how long the answer took to generate, reported as saved
+    # time whenever the entry is reused
+    def put(self, embedding, ids, answer, seconds=0.0, version=None):
+        ids = frozenset(ids)
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._lock:
+            self._check_version(version)
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = (ids, vector, answer, time.monotonic(), seconds)
+            self._by_ids.setdefault(ids, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_ids.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "invalidations": self.invalidations,
+            "saved_seconds": self.saved_seconds,
+        }
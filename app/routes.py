@@ -1,67 +1,196 @@
-from flask import Blueprint, request
-from twilio.rest import Client
+from flask import Blueprint, Response, request
+from langchain_core.messages import AIMessage, HumanMessage
 import sys
 import os
 import time
 from .utils import (
     load_properties_with_embeddings,
-    search_properties_with_embeddings,
+    search_properties,
+    get_embedding_cache,
+    get_response_cache,
+    response_cache_version,
     classify_intent,
+    intent_batcher,
     send_message_to_agent,
     get_agent_info,
     get_property_for_agent,
-    model,
-    tokenizer,
+    get_intent_model,
+    get_intent_cascade,
 )
-from .langchain_ import query_llm
+from .langchain_ import query_llm, stream_llm
+from . import metrics
+from .metrics import stage_timer
+from .sessions import get_session_backend
+from .worker import MessageDispatcher, QueueFull
+from .idempotency import DeliveryTable
+from .streaming import send_streamed_reply, split_message
+from .messaging import get_messenger
+from .scheduler import get_scheduler
 
 # Add the parent directory to the sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import config
 
-# Initialize Twilio client with credentials from environment variables
-client = Client(config.TWILIO_ACCOUNT_SID, config.TWILIO_AUTH_TOKEN)
+
+# Send a reply to the customer through the shared messenger. Returns the body
+# either way, so the webhook response does not depend on the send succeeding
+def send_reply(to, body):
+    sent_message = get_messenger().send(to, body)
+    if sent_message is not None:
+        print(f"Message sent with SID: {sent_message.sid}")
+    return body
+
+
+# Send an answer that may be longer than WhatsApp allows as several messages,
+# split at sentence boundaries
+def send_split_reply(to, body):
+    for message in split_message(body):
+        send_reply(to, message)
+    return body
+
+
+# Hand a scheduled reply to the messenger's send queue, so the scheduler
+# thread never waits on the network
+def send_deferred_reply(to, body):
+    try:
+        get_messenger().submit(to, body)
+    except QueueFull:
+        send_reply(to, body)
+
 
 # Create a Blueprint for the routes
 bp = Blueprint("routes", __name__)
 
+# Background workers used when ASYNC_WEBHOOK is enabled; messages from the
+# same sender are always processed in order
+dispatcher = MessageDispatcher(
+    lambda from_number, incoming_msg: process_message(from_number, incoming_msg),
+    workers=config.WEBHOOK_WORKERS,
+    max_queue=config.WEBHOOK_QUEUE_SIZE,
+)
+
+# Recent webhook deliveries, so Twilio retries are answered without
+# processing the message again
+deliveries = DeliveryTable(
+    ttl=config.WEBHOOK_DEDUPE_TTL,
+    max_size=config.WEBHOOK_DEDUPE_SIZE,
+    wait_timeout=config.WEBHOOK_DEDUPE_WAIT,
+)
+
 
 @bp.route("/", methods=["GET"])
 def home():
     return "Welcome to the WhatsApp bot server!"
 
 
-# Context dictionary to store user states
-user_context = {}
-
-
 @bp.route("/whatsapp", methods=["POST"])
 def whatsapp_webhook():
     incoming_msg = request.values.get("Body", "").strip().lower()
     from_number = request.values.get("From", "")  # Get the sender's WhatsApp number
+    message_sid = request.values.get("MessageSid")
     print(f"----Incoming message: {incoming_msg} from {from_number}----")
 
-    # Check if the user wants to cancel the current state
-    if (
-        from_number in user_context
-        and user_context[from_number] == "awaiting_property_id"
+    # Twilio retries carry the same MessageSid. Without one, only identical
+    # messages from the same sender that arrive while the first is still
+    # being processed are coalesced.
+    key = message_sid or f"{from_number}\n{incoming_msg}"
+
+    if config.ASYNC_WEBHOOK:
+        # Acknowledge Twilio right away; the reply is sent by a worker thread
+        try:
+            deliveries.run(
+                key,
+                lambda: dispatcher.submit(from_number, incoming_msg),
+                retain=message_sid is not None,
+            )
+        except QueueFull:
+            return "Service busy", 503
+        return ""
+
+    reply, duplicate = deliveries.run(
+        key,
+        lambda: process_message(from_number, incoming_msg),
+        retain=message_sid is not None,
+    )
+    if duplicate:
+        print(f"----Duplicate delivery {key!r} from {from_number}----")
+    return reply or ""
+
+
+@bp.route("/whatsapp/queue", methods=["GET"])
+def queue_stats():
+    # Queue depth and counters plus wait/processing latency in milliseconds,
+    # and the deliveries suppressed as duplicates
+    stats = dispatcher.stats()
+    stats["deliveries"] = deliveries.stats()
+    stages = metrics.snapshot()
+    stats["latency"] = {
+        stage: stages[stage] for stage in ("queue_wait", "process") if stage in stages
+    }
+    return stats
+
+
+@bp.route("/whatsapp/send", methods=["GET"])
+def send_stats():
+    # Outbound queue depth, send/retry/failure counters and send latency
+    stats = get_messenger().stats()
+    stages = metrics.snapshot()
+    stats["latency"] = {
+        stage: stages[stage]
+        for stage in ("send", "send_queue_wait", "scheduler_lag")
+        if stage in stages
+    }
+    # Deferred replies waiting to be sent and how far behind schedule they are
+    stats["scheduled"] = get_scheduler().stats()
+    return stats
+
+
+@bp.route("/whatsapp/cache", methods=["GET"])
+def cache_stats():
+    # Hit rates of the query embedding cache, the LLM response cache and the
+    # intent cascade tiers
+    stats = {
+        "embeddings": get_embedding_cache().stats(),
+        "responses": get_response_cache().stats(),
+    }
+    if config.INTENT_CASCADE:
+        stats["intents"] = get_intent_cascade().stats()
+    return stats
+
+
+@bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    # Stage latency histograms and event counters of this worker process
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+# Handle one incoming message end to end and return the body of the reply.
+# Slow messages are logged with their per-stage timings and, when
+# PROFILE_SAMPLE_EVERY is set, a sample of them is profiled.
+def process_message(from_number, incoming_msg):
+    with metrics.traced_request(
+        "message",
+        slow_ms=config.SLOW_REQUEST_MS,
+        profile_every=config.PROFILE_SAMPLE_EVERY,
+        profile_dir=config.PROFILE_DIR or None,
     ):
+        return handle_message(from_number, incoming_msg)
+
+
+def handle_message(from_number, incoming_msg):
+    # User states live in the session backend, shared across workers
+    sessions = get_session_backend()
+    user_state = sessions.get_state(from_number)
+
+    # Check if the user wants to cancel the current state
+    if user_state == "awaiting_property_id":
         if incoming_msg == "cancelar":
-            user_context.pop(from_number, None)
+            sessions.set_state(from_number, None)
             response_message = "La solicitud ha sido cancelada. Puedes continuar chateando normalmente."
-            try:
-                sent_message = client.messages.create(
-                    from_=config.TWILIO_SANDBOX_NUMBER,  # Your Twilio WhatsApp number
-                    body=response_message,
-                    to=from_number,
-                )
-                print(f"Message sent with SID: {sent_message.sid}")
-            except Exception as e:
-                print(f"Failed to send message: {e}")
-            return sent_message.body
+            return send_reply(from_number, response_message)
 
     # Check if the user is in 'expecting property id' context
-    if user_context.get(from_number) == "awaiting_property_id":
+    if user_state == "awaiting_property_id":
         # Process the property ID
         try:
             property_id = incoming_msg.strip()
@@ -74,33 +203,44 @@ def whatsapp_webhook():
                     "Por favor, contacta al cliente para más detalles."
                 )
                 send_message_to_agent(agent_info["phone_number"], agent_message)
-                time.sleep(5)
                 response_message = "Gracias. Hemos notificado al agente. Se pondrán en contacto contigo pronto."
+                # Reset the user's context
+                sessions.set_state(from_number, None)
+
+                # Confirm to the customer after a short delay, without holding
+                # this request; sent right away if the scheduler is full
+                try:
+                    get_scheduler().schedule(
+                        config.AGENT_CONFIRMATION_DELAY,
+                        send_deferred_reply,
+                        from_number,
+                        response_message,
+                    )
+                except QueueFull:
+                    return send_reply(from_number, response_message)
+                return response_message
             else:
                 response_message = "Lo siento, no pude encontrar un agente asociado a ese ID de propiedad. Por favor verifica el ID."
         except ValueError:
             response_message = "Parece que el ID de propiedad proporcionado no es válido. Por favor intenta de nuevo con un número válido."
 
         # Reset the user's context
-        user_context[from_number] = None
+        sessions.set_state(from_number, None)
 
         # Send the response using Twilio's REST API
-        try:
-            sent_message = client.messages.create(
-                from_=config.TWILIO_SANDBOX_NUMBER,  # Your Twilio WhatsApp number
-                body=response_message,
-                to=from_number,
-            )
-            print(f"Message sent with SID: {sent_message.sid}")
-        except Exception as e:
-            print(f"Failed to send message: {e}")
-
-        return sent_message.body
+        return send_reply(from_number, response_message)
 
     else:
         # Classify intent of incoming message
-        intent = classify_intent(incoming_msg, model, tokenizer)
+        with stage_timer("classify"):
+            if config.INTENT_CASCADE:
+                intent = get_intent_cascade().classify(incoming_msg)
+            elif config.INTENT_BATCHING:
+                intent = intent_batcher.classify(incoming_msg)
+            else:
+                intent = classify_intent(incoming_msg, *get_intent_model())
         print(f"----INTENT:{intent}----")
+        metrics.increment("intents_total", intent=intent)
 
         # Prepare the response based on the classified intent
         if intent == "contact agent":
@@ -110,46 +250,89 @@ def whatsapp_webhook():
                 "Si deseas cancelar esta solicitud y continuar chateando, escribe 'cancelar'."
             )
             # Set context to awaiting_property_id for this user
-            user_context[from_number] = "awaiting_property_id"
+            sessions.set_state(from_number, "awaiting_property_id")
 
             # Send the response using Twilio's REST API
-            try:
-                sent_message = client.messages.create(
-                    from_=config.TWILIO_SANDBOX_NUMBER,  # Your Twilio WhatsApp number
-                    body=response_message,
-                    to=from_number,
-                )
-                print(f"Message sent with SID: {sent_message.sid}")
-            except Exception as e:
-                print(f"Failed to send message: {e}")
-
-            return sent_message.body
+            return send_reply(from_number, response_message)
         else:
-            # Load properties with embeddings
-            properties_df = load_properties_with_embeddings()
-
-            # Search for relevant properties using embeddings and return a list of them
-            relevant_properties = search_properties_with_embeddings(
-                properties_df, incoming_msg
+            # Only a conversation's first message can reuse a cached answer;
+            # later ones depend on the chat history
+            use_cache = (
+                config.RESPONSE_CACHE
+                and config.RETRIEVAL_MODE == "direct"
+                and not sessions.get_messages(from_number)
             )
+            cached_response = None
 
-            # Query the LLM
-            llm_response = query_llm(
-                properties=relevant_properties,
-                input=incoming_msg,
-                session_id=from_number,
-            )
-            print(f"LLM response: {llm_response}")
+            if config.RETRIEVAL_MODE == "contextualized":
+                # The chain searches with the history-aware question itself
+                relevant_properties = None
+            else:
+                # Load the compiled embedding store (cached after the first call)
+                embedding_store = load_properties_with_embeddings()
 
-            # Send the response using Twilio's REST API
-            try:
-                sent_message = client.messages.create(
-                    from_=config.TWILIO_SANDBOX_NUMBER,  # Your Twilio WhatsApp number
-                    body=llm_response,
-                    to=from_number,
+                # Search for relevant properties using embeddings and return a list of them
+                property_ids, relevant_properties, query_embedding = search_properties(
+                    embedding_store, incoming_msg
                 )
-                print(f"Message sent with SID: {sent_message.sid}")  # Debugging line
-            except Exception as e:
-                print(f"Failed to send message: {e}")  # Debugging line
 
-            return sent_message.body
+                # Lexical-only retrieval has no embedding to key the cache on
+                use_cache = use_cache and query_embedding is not None
+                if use_cache:
+                    with stage_timer("response_cache"):
+                        cache_version = response_cache_version()
+                        cached_response = get_response_cache().get(
+                            query_embedding, property_ids, version=cache_version
+                        )
+
+            if cached_response is not None:
+                llm_response = cached_response
+                # Keep the exchange in the history so follow-ups have context
+                sessions.add_messages(
+                    from_number,
+                    [
+                        HumanMessage(content=incoming_msg),
+                        AIMessage(content=llm_response),
+                    ],
+                )
+                print(f"Cached LLM response: {llm_response}")
+            else:
+                generate_start = time.perf_counter()
+                if config.STREAM_REPLIES:
+                    # Send each part of the answer as soon as it is generated
+                    with stage_timer("llm"):
+                        llm_response = send_streamed_reply(
+                            stream_llm(
+                                properties=relevant_properties,
+                                input=incoming_msg,
+                                session_id=from_number,
+                            ),
+                            lambda body: send_reply(from_number, body),
+                            min_chars=config.STREAM_MIN_CHARS,
+                        )
+                else:
+                    # Query the LLM
+                    with stage_timer("llm"):
+                        llm_response = query_llm(
+                            properties=relevant_properties,
+                            input=incoming_msg,
+                            session_id=from_number,
+                        )
+                print(f"LLM response: {llm_response}")
+
+                if use_cache:
+                    get_response_cache().put(
+                        query_embedding,
+                        property_ids,
+                        llm_response,
+                        seconds=time.perf_counter() - generate_start,
+                        version=cache_version,
+                    )
+
+                if config.STREAM_REPLIES:
+                    # Already sent chunk by chunk
+                    return llm_response
+
+            # Send the response using Twilio's REST API, in several messages
+            # if it is too long for one
+            return send_split_reply(from_number, llm_response)
@@ -0,0 +1,103 @@
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from app import metrics
+from app.worker import QueueFull
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import config
+
+
+class Scheduler:
+    """Runs callbacks after a delay on one background thread.
+
+    Pending tasks sit in a heap ordered by due time; the thread sleeps until
+    the earliest one is due (or a sooner task arrives). Callbacks should be
+    quick, e.g. hand a message to the messenger's send queue, since they
+    delay every task behind them. How late each task runs is recorded as the
+    "scheduler_lag" stage.
+    """
+
+    def __init__(self, max_pending=10000, name="scheduler"):
+        self.max_pending = max_pending
+        self.name = name
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self.executed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+
+    def schedule(self, delay, callback, *args):
+        self.start()
+        due = time.monotonic() + delay
+        with self._condition:
+            if len(self._heap) >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"{len(self._heap)} tasks already scheduled")
+            # The sequence number keeps tasks due at the same time in FIFO order
+            heapq.heappush(self._heap, (due, next(self._sequence), callback, args))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    if self._heap:
+                        self._condition.wait(self._heap[0][0] - time.monotonic())
+                    else:
+                        self._condition.wait()
+                due, _, callback, args = heapq.heappop(self._heap)
+            metrics.record("scheduler_lag", max(0.0, time.monotonic() - due))
+            try:
+                callback(*args)
+                self.executed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Scheduled task {callback} failed: {e}")
+
+    def pending(self):
+        with self._condition:
+            return len(self._heap)
+
+    # Seconds the most overdue pending task is behind schedule
+    def lag(self):
+        with self._condition:
+            if not self._heap:
+                return 0.0
+            return max(0.0, time.monotonic() - self._heap[0][0])
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "lag_seconds": self.lag(),
+            "executed": self.executed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler(max_pending=config.SCHEDULER_MAX_PENDING)
+    return _scheduler
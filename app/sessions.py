@@ -0,0 +1,281 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import config
+
+
+# Rough token estimate (~4 characters per token for Spanish/English text)
+def approx_token_count(text):
+    return max(1, len(text) // 4)
+
+
+# Keep the most recent messages that fit in both the turn and token windows.
+# The kept window always starts on a human message so the model never sees
+# an answer without its question.
+def trim_history(messages, max_turns=None, max_tokens=None, token_counter=None):
+    token_counter = token_counter or approx_token_count
+    kept = []
+    tokens = 0
+    human_turns = 0
+    for message in reversed(messages):
+        cost = token_counter(str(message.content))
+        if max_tokens is not None and kept and tokens + cost > max_tokens:
+            break
+        if message.type == "human":
+            if max_turns is not None and human_turns >= max_turns:
+                break
+            human_turns += 1
+        kept.append(message)
+        tokens += cost
+    kept.reverse()
+    while kept and kept[0].type != "human":
+        kept.pop(0)
+    return kept
+
+
+class SessionBackend:
+    """Per-sender conversation history and webhook state (e.g. awaiting_property_id)."""
+
+    def __init__(self, max_turns=None, max_tokens=None, token_counter=None):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter
+
+    def _trim(self, messages):
+        return trim_history(
+            messages, self.max_turns, self.max_tokens, self.token_counter
+        )
+
+    def get_messages(self, session_id):
+        raise NotImplementedError
+
+    def add_messages(self, session_id, messages):
+        raise NotImplementedError
+
+    def clear_messages(self, session_id):
+        raise NotImplementedError
+
+    def get_state(self, session_id):
+        raise NotImplementedError
+
+    def set_state(self, session_id, state):
+        raise NotImplementedError
+
+
+class InMemorySessionBackend(SessionBackend):
+    """Process-local sessions bounded by count (LRU) and idle time (TTL)."""
+
+    def __init__(self, max_sessions=10000, ttl=86400, **kwargs):
+        super().__init__(**kwargs)
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Returns the live session dict, creating it if needed; caller holds the lock
+    def _session(self, session_id, create=False):
+        session = self._sessions.get(session_id)
+        now = time.monotonic()
+        if session is not None and self.ttl and now - session["updated"] > self.ttl:
+            del self._sessions[session_id]
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = {"messages": [], "state": None, "updated": now}
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        session["updated"] = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def get_messages(self, session_id):
+        with self._lock:
+            session = self._session(session_id)
+            return list(session["messages"]) if session else []
+
+    def add_messages(self, session_id, messages):
+        with self._lock:
+            session = self._session(session_id, create=True)
+            session["messages"] = self._trim(session["messages"] + list(messages))
+
+    def clear_messages(self, session_id):
+        with self._lock:
+            session = self._session(session_id)
+            if session:
+                session["messages"] = []
+
+    def get_state(self, session_id):
+        with self._lock:
+            session = self._session(session_id)
+            return session["state"] if session else None
+
+    def set_state(self, session_id, state):
+        with self._lock:
+            self._session(session_id, create=True)["state"] = state
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Sessions in a SQLite file, shared by all workers and kept across restarts."""
+
+    # Expired and excess sessions are pruned every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, max_sessions=100000, ttl=86400, **kwargs):
+        super().__init__(**kwargs)
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.path = path
+        self._connect()
+
+    def _connect(self):
+        self._pid = os.getpid()
+        self._connection = sqlite3.connect(
+            self.path, check_same_thread=False, timeout=10
+        )
+        # WAL lets other workers read while one of them writes
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, messages TEXT NOT NULL, "
+            "state TEXT, updated REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)"
+        )
+        self._connection.commit()
+
+    # SQLite connections must not be used across fork, so a forked worker
+    # (e.g. after the gunicorn warmup) opens its own
+    @property
+    def _conn(self):
+        if self._pid != os.getpid():
+            self._connect()
+        return self._connection
+
+    def _row(self, session_id):
+        row = self._conn.execute(
+            "SELECT messages, state, updated FROM sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None or (self.ttl and time.time() - row[2] > self.ttl):
+            return [], None
+        return messages_from_dict(json.loads(row[0])), row[1]
+
+    def _write(self, session_id, messages, state):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, messages, state, updated) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                session_id,
+                json.dumps(messages_to_dict(messages), ensure_ascii=False),
+                state,
+                time.time(),
+            ),
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune(self):
+        if self.ttl:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE updated < ?", (time.time() - self.ttl,)
+            )
+        self._conn.execute(
+            "DELETE FROM sessions WHERE session_id NOT IN "
+            "(SELECT session_id FROM sessions ORDER BY updated DESC LIMIT ?)",
+            (self.max_sessions,),
+        )
+
+    # Read-modify-write under an immediate transaction so concurrent workers
+    # updating the same sender cannot lose each other's changes
+    def _update(self, session_id, update):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                messages, state = self._row(session_id)
+                messages, state = update(messages, state)
+                self._write(session_id, messages, state)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def get_messages(self, session_id):
+        with self._lock:
+            return self._row(session_id)[0]
+
+    def add_messages(self, session_id, messages):
+        self._update(
+            session_id,
+            lambda history, state: (self._trim(history + list(messages)), state),
+        )
+
+    def clear_messages(self, session_id):
+        self._update(session_id, lambda history, state: ([], state))
+
+    def get_state(self, session_id):
+        with self._lock:
+            return self._row(session_id)[1]
+
+    def set_state(self, session_id, state):
+        self._update(session_id, lambda history, _: (history, state))
+
+
+class SessionChatMessageHistory(BaseChatMessageHistory):
+    """LangChain chat history view over one session of a SessionBackend."""
+
+    def __init__(self, backend, session_id):
+        self.backend = backend
+        self.session_id = session_id
+
+    @property
+    def messages(self):
+        return self.backend.get_messages(self.session_id)
+
+    def add_messages(self, messages):
+        self.backend.add_messages(self.session_id, messages)
+
+    def clear(self):
+        self.backend.clear_messages(self.session_id)
+
+
+def create_session_backend():
+    options = {
+        "ttl": config.SESSION_TTL,
+        "max_sessions": config.SESSION_MAX,
+        "max_turns": config.HISTORY_MAX_TURNS,
+        "max_tokens": config.HISTORY_MAX_TOKENS,
+    }
+    if config.SESSION_BACKEND == "sqlite":
+        return SQLiteSessionBackend(config.SESSION_DB_PATH, **options)
+    if config.SESSION_BACKEND == "memory":
+        return InMemorySessionBackend(**options)
+    raise ValueError(f"Unknown session backend '{config.SESSION_BACKEND}'")
+
+
+# Shared by routes (webhook state) and langchain_ (chat history)
+_session_backend = None
+_session_backend_lock = threading.Lock()
+
+
+def get_session_backend():
+    global _session_backend
+    if _session_backend is None:
+        with _session_backend_lock:
+            if _session_backend is None:
+                _session_backend = create_session_backend()
+    return _session_backend
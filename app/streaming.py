@@ -0,0 +1,73 @@
+import re
+import time
+from app import metrics
+
+# WhatsApp rejects message bodies longer than this
+WHATSAPP_LIMIT = 1600
+
+# End of a sentence or paragraph, followed by whitespace
+_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n\s*\n")
+
+
+# Position right after the last sentence boundary within text[:limit]
+def _last_boundary(text, limit):
+    end = 0
+    for match in _BOUNDARY.finditer(text, 0, limit + 1):
+        end = match.end()
+    return end
+
+
+def _cut(text, limit):
+    end = _last_boundary(text, limit)
+    if end == 0:
+        # No sentence ends in time; fall back to the last space, then a hard cut
+        end = text.rfind(" ", 0, limit) + 1 or limit
+    return text[:end].strip(), text[end:]
+
+
+# Split a complete reply into WhatsApp-sized messages at sentence boundaries
+def split_message(text, limit=WHATSAPP_LIMIT):
+    messages = []
+    while len(text) > limit:
+        message, text = _cut(text, limit)
+        if message:
+            messages.append(message)
+    if text.strip():
+        messages.append(text.strip())
+    return messages
+
+
+# Turn a stream of text deltas into messages of at most `limit` characters.
+# A message is emitted as soon as the buffer holds at least `min_chars`
+# characters ending on a sentence boundary, so the first part of a long
+# answer goes out while the rest is still being generated.
+def chunk_stream(deltas, limit=WHATSAPP_LIMIT, min_chars=400):
+    buffer = ""
+    for delta in deltas:
+        buffer += delta
+        while len(buffer) > limit:
+            message, buffer = _cut(buffer, limit)
+            if message:
+                yield message
+        if len(buffer) >= min_chars:
+            end = _last_boundary(buffer, limit)
+            if end >= min_chars:
+                message, buffer = buffer[:end].strip(), buffer[end:]
+                if message:
+                    yield message
+    if buffer.strip():
+        yield buffer.strip()
+
+
+# Send each chunk as soon as it is ready, recording time to the first
+# message and to the full answer. Returns the complete text that was sent.
+def send_streamed_reply(deltas, send, limit=WHATSAPP_LIMIT, min_chars=400):
+    start = time.perf_counter()
+    sent = []
+    for message in chunk_stream(deltas, limit=limit, min_chars=min_chars):
+        send(message)
+        if not sent:
+            metrics.record("first_message", time.perf_counter() - start)
+        sent.append(message)
+    metrics.record("full_answer", time.perf_counter() - start)
+    return "\n".join(sent)
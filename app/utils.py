@@ -1,41 +1,121 @@
 import re
-import json
 import os
 import sys
+import threading
+import time
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-from langchain_openai import OpenAIEmbeddings
-from twilio.rest import Client
-import nltk
-from nltk.corpus import stopwords
-
-# Set of stopwords in Spanish
-nltk.download("stopwords")
-stop_words = set(stopwords.words("spanish"))
 
 # Add the parent directory to the sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import config
+from app.embedding_store import (
+    load_store,
+    convert_csv_to_store,
+    store_exists,
+    store_version,
+)
+from app.vector_index import build_index, normalize_rows
+from app.embedding_cache import EmbeddingCache
+from app.response_cache import ResponseCache
+from app import metrics
+from app.metrics import stage_timer, timed
+from app.intent_batcher import IntentBatcher
+from app.intent_cascade import IntentCascade, load_or_train_linear_model
+from app.messaging import get_messenger
+from app.worker import QueueFull
+from app.catalog import Catalog
+from app.attribute_filter import AttributeIndex, normalize, parse_query_constraints
+from app.lexical_index import BM25Index, fuse_scores, mark_property_ids
+
+# Heavy components (NLTK corpus, intent model, API clients) are created on
+# first use, not at import, so forks, tests and CLI commands start fast and
+# offline. Call app.warmup() to load them up front, e.g. before gunicorn forks.
+_stop_words = None
+
+
+# Set of stopwords in Spanish
+def get_stop_words():
+    global _stop_words
+    if _stop_words is None:
+        from nltk.corpus import stopwords
+
+        try:
+            words = stopwords.words("spanish")
+        except LookupError:
+            # Only hit the network when the corpus is not installed yet
+            import nltk
+
+            nltk.download("stopwords", quiet=True)
+            words = stopwords.words("spanish")
+        _stop_words = set(words)
+    return _stop_words
+
+
+# Listings and agents indexed by id, reloaded when the JSON files change
+_catalog = None
+
+
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        _catalog = Catalog()
+    return _catalog
 
 
 def property_data():
-    file_path = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "data", "property_listings.json")
-    )
-    with open(file_path, "r") as file:
-        properties = json.load(file)
-    return properties
+    return get_catalog().properties()
+
+
+# The compiled embedding store is loaded once per process and shared
+# read-only; it is reopened when the indexer publishes a new version
+STORE_CHECK_INTERVAL = 5.0
+_embedding_store = None
+_embedding_store_version = None
+_embedding_store_checked = 0.0
+_embedding_store_lock = threading.Lock()
 
 
 def load_properties_with_embeddings():
-    file_path = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "..", "data", "openai_embeddings.csv")
-    )
-    df = pd.read_csv(file_path, converters={"embedding": eval})
-    return df
+    global _embedding_store, _embedding_store_version, _embedding_store_checked
+    now = time.monotonic()
+    if (
+        _embedding_store is not None
+        and now - _embedding_store_checked < STORE_CHECK_INTERVAL
+    ):
+        return _embedding_store
+    with _embedding_store_lock:
+        _embedding_store_checked = now
+        # Compile the store from the legacy CSV the first time it is needed
+        if _embedding_store is None and not store_exists():
+            convert_csv_to_store()
+        version = store_version()
+        if _embedding_store is None or version != _embedding_store_version:
+            _embedding_store = load_store()
+            _embedding_store_version = version
+    return _embedding_store
+
+
+# The vector index is built once per loaded store
+_vector_index = None
+_vector_index_store = None
+
+
+def get_vector_index(store):
+    global _vector_index, _vector_index_store
+    if _vector_index is None or _vector_index_store is not store:
+        kwargs = {}
+        if config.VECTOR_INDEX_BACKEND == "compressed":
+            kwargs = {
+                "encoding": config.VECTOR_ENCODING,
+                "dimension": config.VECTOR_REDUCED_DIM,
+                "rescore": config.VECTOR_RESCORE_CANDIDATES,
+            }
+        _vector_index = build_index(
+            store.embeddings, backend=config.VECTOR_INDEX_BACKEND, **kwargs
+        )
+        _vector_index_store = store
+    return _vector_index
 
 
 # Function that will clean the data to be embedded
@@ -91,6 +171,7 @@ def clean_text(text):
     text = text.lower()  # Normalize to lowercase
     text = re.sub(r"[^\w\s]", "", text)  # Remove punctuation
     # Remove stop words
+    stop_words = get_stop_words()
     text = " ".join([word for word in text.split() if word not in stop_words])
     return text
 
@@ -111,12 +192,37 @@ def property_to_string(property):
             """
 
 
+# Reuse a single embeddings client (and its HTTP connection pool)
+_embed_model = None
+
+
 def openai_embeddings(texts):
-    OPENAI_API_KEY = None
-    embed_model = OpenAIEmbeddings(
-        model="text-embedding-3-small", api_key=OPENAI_API_KEY
-    )
-    return embed_model.embed_documents(texts)
+    global _embed_model
+    if _embed_model is None:
+        from langchain_openai import OpenAIEmbeddings
+
+        OPENAI_API_KEY = None
+        _embed_model = OpenAIEmbeddings(
+            model="text-embedding-3-small", api_key=OPENAI_API_KEY
+        )
+    return _embed_model.embed_documents(texts)
+
+
+# Cache of query embeddings keyed on the clean_text-normalized query
+_embedding_cache = None
+
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(
+            openai_embeddings,
+            normalize=clean_text,
+            max_size=config.EMBEDDING_CACHE_SIZE,
+            ttl=config.EMBEDDING_CACHE_TTL,
+            disk_path=config.EMBEDDING_CACHE_PATH or None,
+        )
+    return _embedding_cache
 
 
 def save_properties_to_csv(properties, file_name):
@@ -137,65 +243,237 @@ def save_properties_to_csv(properties, file_name):
     df.to_csv(output_file_path, index=False)
 
 
-def search_properties_with_embeddings(properties_df, query):
-    query_embedding = np.array(openai_embeddings([query])).reshape(1, -1)
-    property_embeddings = np.stack(properties_df["embedding"].values)
+# Columnar listing attributes aligned with the store rows, rebuilt when
+# either the store or the catalog changes
+_attribute_index = None
+_attribute_index_key = None
 
-    similarities = cosine_similarity(query_embedding, property_embeddings).flatten()
-    top_indices = similarities.argsort()[-5:][::-1]  # Get top 5 most similar properties
-    top_properties = properties_df.iloc[top_indices]["property_string"].values
 
-    return top_properties
+def get_attribute_index(store):
+    global _attribute_index, _attribute_index_key
+    catalog = get_catalog()
+    catalog.properties()  # Picks up a pending catalog reload
+    key = (id(store), catalog.version)
+    if _attribute_index is None or _attribute_index_key != key:
+        _attribute_index = AttributeIndex(
+            [
+                catalog.get_property(property_id) if property_id is not None else None
+                for property_id in store.ids
+            ]
+        )
+        _attribute_index_key = key
+    return _attribute_index
+
+
+# Rows matching the price/bedroom/neighborhood constraints in the query, or
+# None when the query has no constraints or nothing would match
+def filter_rows(store, query):
+    attributes = get_attribute_index(store)
+    constraints = parse_query_constraints(query, attributes.places)
+    mask = attributes.filter(constraints)
+    if mask is None or not mask.any():
+        return None
+    return np.flatnonzero(mask)
+
+
+# Tokens for BM25: clean_text, accents stripped so "cumbaya" matches "Cumbayá"
+def lexical_tokens(text):
+    return normalize(clean_text(text)).split()
+
+
+# BM25 over the clean_and_transform_data text of each store row (plus an
+# "id<n>" token), rebuilt when either the store or the catalog changes
+_lexical_index = None
+_lexical_index_key = None
+_lexical_index_lock = threading.Lock()
+
+
+def get_lexical_index(store):
+    global _lexical_index, _lexical_index_key
+    catalog = get_catalog()
+    catalog.properties()  # Picks up a pending catalog reload
+    key = (id(store), catalog.version)
+    if _lexical_index is not None and _lexical_index_key == key:
+        return _lexical_index
+    # Build once even when several requests notice the change together
+    with _lexical_index_lock:
+        if _lexical_index is not None and _lexical_index_key == key:
+            return _lexical_index
+        documents = []
+        for property_id, property_string in zip(store.ids, store.property_strings):
+            listing = None
+            if property_id is not None:
+                listing = catalog.get_property(property_id)
+            if listing is None:
+                documents.append(property_string)
+            else:
+                documents.append(f"{clean_and_transform_data(listing)} id{property_id}")
+        _lexical_index = BM25Index(documents, lexical_tokens)
+        _lexical_index_key = key
+        return _lexical_index
+
+
+# Lexical candidates for the query, and whether they are good enough to
+# answer without an embedding: the query names a listing id that exists, or
+# every one of the top k contains (nearly) all of the query's terms
+def lexical_candidates(store, query, rows, k):
+    lexical = get_lexical_index(store)
+    terms = lexical.query_terms(mark_property_ids(query))
+    found, scores = lexical.search(terms, k=config.HYBRID_CANDIDATES, rows=rows)
+    names_listing = any(
+        re.fullmatch(r"id\d+", term) and term in lexical.vocabulary for term in terms
+    )
+    needed = min(k, len(rows) if rows is not None else len(lexical))
+    best = found[:k]
+    confident = bool(
+        (len(best) > 0 and names_listing)
+        or (
+            len(best) >= needed > 0
+            and np.all(lexical.coverage(terms, best) >= config.LEXICAL_MIN_COVERAGE)
+        )
+    )
+    return found, scores, confident
+
+
+# Ids, formatted listings and query embedding of the top k matches. The
+# embedding is None when the lexical index answered on its own.
+@timed("retrieve")
+def search_properties(store, query, k=5):
+    with stage_timer("filter"):
+        rows = filter_rows(store, query) if config.METADATA_FILTERING else None
+
+    lexical_rows = None
+    if config.LEXICAL_RETRIEVAL == "hybrid":
+        with stage_timer("lexical"):
+            lexical_rows, lexical_scores, confident = lexical_candidates(
+                store, query, rows, k
+            )
+        if confident:
+            # Exact terms matched strongly enough; skip the embedding call
+            metrics.increment("retrieval_total", path="lexical")
+            top_indices = lexical_rows[:k]
+            return (
+                [store.ids[i] for i in top_indices],
+                [store.property_strings[i] for i in top_indices],
+                None,
+            )
+
+    with stage_timer("embed"):
+        query_embedding = get_embedding_cache().embed_query(query)
+
+    # Get the top k most similar properties, scoring only the filtered subset
+    with stage_timer("search"):
+        index = get_vector_index(store)
+        n_candidates = k if lexical_rows is None else config.HYBRID_CANDIDATES
+        if rows is None:
+            top_indices, _ = index.search(query_embedding, k=n_candidates)
+        else:
+            top_indices, _ = index.search_subset(query_embedding, rows, k=n_candidates)
+
+        if lexical_rows is not None:
+            query_vector = normalize_rows(np.reshape(query_embedding, (1, -1)))[0]
+            top_indices = fuse_scores(
+                top_indices,
+                lexical_rows,
+                lexical_scores,
+                lambda candidates: np.asarray(index.matrix[candidates]) @ query_vector,
+                alpha=config.HYBRID_ALPHA,
+                k=k,
+            )
+    metrics.increment(
+        "retrieval_total", path="vector" if lexical_rows is None else "hybrid"
+    )
+    top_ids = [store.ids[i] for i in top_indices]
+    top_properties = [store.property_strings[i] for i in top_indices]
+
+    return top_ids, top_properties, query_embedding
+
+
+def search_properties_with_embeddings(store, query, k=5):
+    return search_properties(store, query, k)[1]
+
+
+# Cached answers for first messages (RESPONSE_CACHE), dropped whenever the
+# embedding store or the catalog is reloaded
+_response_cache = None
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            threshold=config.RESPONSE_CACHE_THRESHOLD,
+            max_size=config.RESPONSE_CACHE_SIZE,
+            ttl=config.RESPONSE_CACHE_TTL,
+        )
+    return _response_cache
+
+
+def response_cache_version():
+    catalog = get_catalog()
+    catalog.properties()  # Picks up a pending catalog reload
+    return (_embedding_store_version, catalog.version)
 
 
 # ----Load properties to generate embeddings and save to CSV----
 # properties = property_data()
 # save_properties_to_csv(properties, 'properties_with_embeddings.csv')
+# To keep the embedding store up to date incrementally, run instead:
+# python -m app.indexer
 
 
-# Load agent information
-def load_agent_data():
-    with open("data/agent_data.json", "r") as f:
-        return json.load(f)
-
-
-# Get agent information based on property ID
+# Get agent information based on property ID (None if there is no agent)
 def get_agent_info(property_id):
-    agents = load_agent_data()
-    return agents[property_id]
+    return get_catalog().get_agent(property_id)
 
 
 # Get property info for the agent based on the id provided by the client
 def get_property_for_agent(id):
-    properties = pd.read_json("data/property_listings.json")
-    retrieved_property = properties[properties["id"] == int(id)]
-    location = retrieved_property["location"].values[0]
-    neighborhood = retrieved_property["neighborhood"].values[0]
-    return (location, neighborhood)
+    retrieved_property = get_catalog().get_property(id)
+    if retrieved_property is None:
+        raise ValueError(f"Unknown property ID: {id}")
+    return (retrieved_property["location"], retrieved_property["neighborhood"])
 
 
-# Send a message to the agent with the customer's details
+# Send a message to the agent with the customer's details. The message is
+# queued for the messenger's background workers so the webhook does not wait
+# on it; it is sent inline if the send queue is full.
 def send_message_to_agent(agent_phone_number, message):
-    client = Client(config.TWILIO_ACCOUNT_SID, config.TWILIO_AUTH_TOKEN)
+    messenger = get_messenger()
+    to = f"whatsapp:{agent_phone_number}"
     try:
-        sent_message = client.messages.create(
-            from_=config.TWILIO_SANDBOX_NUMBER,  # Your Twilio WhatsApp number
-            body=message,
-            to=f"whatsapp:{agent_phone_number}",
-        )
-        print(f"Message sent to agent with SID: {sent_message.sid}")
-    except Exception as e:
-        print(f"Failed to send message to agent: {e}")
+        return messenger.submit(to, message)
+    except QueueFull:
+        sent_message = messenger.send(to, message)
+        if sent_message is not None:
+            print(f"Message sent to agent with SID: {sent_message.sid}")
 
 
 # ----Intent Classification----
 model_path = "./results/model-6"
-model = AutoModelForSequenceClassification.from_pretrained(model_path)
-tokenizer = AutoTokenizer.from_pretrained("roberta-base")
-model.eval()
+_intent_model = None
+_intent_model_lock = threading.Lock()
+
+
+# Load the intent model and tokenizer once, on first use
+def get_intent_model():
+    global _intent_model
+    if _intent_model is None:
+        with _intent_model_lock:
+            if _intent_model is None:
+                from transformers import AutoTokenizer
+                from app.intent_model import load_intent_model
+
+                model = load_intent_model(model_path, config.INTENT_MODEL_RUNTIME)
+                tokenizer = AutoTokenizer.from_pretrained("roberta-base")
+                model.eval()
+                _intent_model = (model, tokenizer)
+    return _intent_model
 
 
 def classify_intent(text, model, tokenizer):
+    import torch
+
     text_cleaned = clean_text(text)
     inputs = tokenizer(text_cleaned, return_tensors="pt", truncation=True, padding=True)
     with torch.no_grad():
@@ -203,3 +481,55 @@ def classify_intent(text, model, tokenizer):
     logits = outputs.logits
     predicted_class_id = logits.argmax().item()
     return "contact agent" if predicted_class_id == 0 else "other"
+
+
+# Classify many messages with a single dynamically padded forward pass
+def classify_intents(texts, model, tokenizer):
+    import torch
+
+    texts_cleaned = [clean_text(text) for text in texts]
+    inputs = tokenizer(
+        texts_cleaned, return_tensors="pt", truncation=True, padding=True
+    )
+    with torch.no_grad():
+        outputs = model(**inputs)
+    predicted_class_ids = outputs.logits.argmax(dim=-1).tolist()
+    return [
+        "contact agent" if class_id == 0 else "other"
+        for class_id in predicted_class_ids
+    ]
+
+
+# Micro-batches concurrent requests into one forward pass (INTENT_BATCHING)
+intent_batcher = IntentBatcher(
+    lambda texts: classify_intents(texts, *get_intent_model()),
+    max_batch_size=config.INTENT_MAX_BATCH_SIZE,
+    max_wait_ms=config.INTENT_MAX_WAIT_MS,
+)
+
+
+# Transformer classification of one message, batched if INTENT_BATCHING
+def classify_intent_full(text):
+    if config.INTENT_BATCHING:
+        return intent_batcher.classify(text)
+    return classify_intent(text, *get_intent_model())
+
+
+# Memo -> linear model -> transformer (INTENT_CASCADE)
+_intent_cascade = None
+_intent_cascade_lock = threading.Lock()
+
+
+def get_intent_cascade():
+    global _intent_cascade
+    if _intent_cascade is None:
+        with _intent_cascade_lock:
+            if _intent_cascade is None:
+                _intent_cascade = IntentCascade(
+                    load_or_train_linear_model(clean_text),
+                    classify_intent_full,
+                    normalize=lambda text: normalize(clean_text(text)),
+                    threshold=config.INTENT_CASCADE_THRESHOLD,
+                    memo_size=config.INTENT_MEMO_SIZE,
+                )
+    return _intent_cascade
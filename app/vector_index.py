@@ -0,0 +1,307 @@
+import numpy as np
+
+
+# Scale rows to unit length so a dot product equals cosine similarity
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _is_normalized(matrix, tolerance=1e-3):
+    if len(matrix) == 0:
+        return True
+    norms = np.linalg.norm(matrix, axis=1)
+    return bool(np.all(np.abs(norms - 1.0) < tolerance))
+
+
+# Select the k best scores without sorting the whole array
+def top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+# Exact search restricted to the given rows of a normalized matrix. Used
+# after metadata pre-filtering, so only the matching subset is scored.
+def search_rows(matrix, query, rows, k=5):
+    query = normalize_rows(np.reshape(query, (1, -1)))[0]
+    rows = np.asarray(rows, dtype=np.int64)
+    scores = np.asarray(matrix[rows]) @ query
+    best = top_k(scores, k)
+    return rows[best], scores[best]
+
+
+class ExactIndex:
+    """Brute-force cosine search over a pre-normalized matrix."""
+
+    def __init__(self, embeddings):
+        embeddings = np.asarray(embeddings)
+        # OpenAI embeddings are already unit length; reuse the (possibly
+        # memory-mapped) matrix in that case instead of copying it
+        if embeddings.dtype == np.float32 and _is_normalized(embeddings):
+            self.matrix = embeddings
+        else:
+            self.matrix = normalize_rows(embeddings)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def search(self, query, k=5):
+        query = normalize_rows(np.reshape(query, (1, -1)))[0]
+        scores = self.matrix @ query
+        indices = top_k(scores, k)
+        return indices, scores[indices]
+
+    def search_subset(self, query, rows, k=5):
+        return search_rows(self.matrix, query, rows, k)
+
+
+class IVFIndex:
+    """Inverted-file index: k-means partitions, only the closest are scanned.
+
+    Each query scores the centroids, picks the ``n_probe`` nearest lists and
+    runs an exact search over the vectors in those lists only.
+    """
+
+    def __init__(self, embeddings, n_lists=None, n_probe=8, n_iter=10, seed=0):
+        self.matrix = ExactIndex(embeddings).matrix
+        n = len(self.matrix)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(n)))
+        self.n_lists = max(1, min(n_lists, n))
+        self.n_probe = n_probe
+        self.centroids = self._train(n_iter, seed)
+        assignments = self._assign(self.matrix)
+
+        # Row ids of each list, stored contiguously and ascending within a
+        # list. Vectors are read from the matrix itself rather than copied
+        # into list order, so the index adds no second copy of the store.
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.list_ids = order
+
+    def __len__(self):
+        return len(self.matrix)
+
+    # Spherical k-means on a sample of the data
+    def _train(self, n_iter, seed):
+        rng = np.random.default_rng(seed)
+        n = len(self.matrix)
+        sample_size = min(n, max(self.n_lists * 64, 10000))
+        sample = self.matrix[rng.choice(n, size=sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, size=self.n_lists, replace=False)]
+        for _ in range(n_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(self.n_lists):
+                members = sample[labels == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = normalize_rows(centroids)
+        return centroids
+
+    def _assign(self, vectors, batch_size=8192):
+        labels = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), batch_size):
+            batch = np.asarray(vectors[start : start + batch_size])
+            labels[start : start + batch_size] = np.argmax(
+                batch @ self.centroids.T, axis=1
+            )
+        return labels
+
+    def search(self, query, k=5, n_probe=None):
+        query = normalize_rows(np.reshape(query, (1, -1)))[0]
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        probed = top_k(self.centroids @ query, n_probe)
+
+        # Sorted so a memory-mapped matrix is read front to back
+        candidate_ids = np.sort(
+            np.concatenate(
+                [self.list_ids[self.offsets[i] : self.offsets[i + 1]] for i in probed]
+            )
+        )
+        scores = self.matrix[candidate_ids] @ query
+        best = top_k(scores, k)
+        return candidate_ids[best], scores[best]
+
+    def search_subset(self, query, rows, k=5):
+        return search_rows(self.matrix, query, rows, k)
+
+
+class HNSWIndex:
+    """Graph index backed by hnswlib (installed with chroma-hnswlib)."""
+
+    def __init__(self, embeddings, m=16, ef_construction=200, ef_search=64):
+        import hnswlib
+
+        matrix = ExactIndex(embeddings).matrix
+        self.matrix = matrix
+        self.index = hnswlib.Index(space="ip", dim=matrix.shape[1])
+        self.index.init_index(
+            max_elements=len(matrix), ef_construction=ef_construction, M=m
+        )
+        self.index.add_items(np.asarray(matrix), np.arange(len(matrix)))
+        self.index.set_ef(ef_search)
+        self._size = len(matrix)
+
+    def __len__(self):
+        return self._size
+
+    def search(self, query, k=5):
+        query = normalize_rows(np.reshape(query, (1, -1)))
+        k = min(k, self._size)
+        labels, distances = self.index.knn_query(query, k=k)
+        # hnswlib reports inner-product distance as 1 - similarity
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def search_subset(self, query, rows, k=5):
+        return search_rows(self.matrix, query, rows, k)
+
+
+class CompressedIndex:
+    """Exact scan over compressed vectors, re-scored at full precision.
+
+    ``encoding`` is one of:
+
+    - "float16": half-precision copy of the matrix (NumPy converts half
+      floats in software, so scans are slower than float32)
+    - "int8": each vector scaled by its own max(|x|) / 127 and rounded
+    - "truncate": the first ``dimension`` components, renormalized
+      (Matryoshka embeddings such as text-embedding-3 keep most of their
+      quality when truncated)
+    - "pca": projection on the top ``dimension`` right singular vectors of
+      a sample, which preserves dot products as well as a rank-``dimension``
+      approximation can
+
+    The best ``rescore`` candidates of the compressed scan are re-scored
+    against the full float32 matrix, which stays memory-mapped so only
+    those rows are read. ``rescore=0`` returns the compressed ranking.
+    """
+
+    ENCODINGS = ("float16", "int8", "truncate", "pca")
+
+    def __init__(self, embeddings, encoding="int8", dimension=256, rescore=50, seed=0):
+        if encoding not in self.ENCODINGS:
+            raise ValueError(
+                f"Unknown vector encoding '{encoding}'. "
+                f"Choose one of: {', '.join(self.ENCODINGS)}"
+            )
+        self.matrix = ExactIndex(embeddings).matrix
+        self.encoding = encoding
+        self.rescore = rescore
+        self.scales = None
+        self.projection = None
+        dimension = min(dimension, self.matrix.shape[1]) if self.matrix.size else 0
+
+        if encoding == "float16":
+            self.codes = self._encode_batches(lambda batch: batch.astype(np.float16))
+        elif encoding == "int8":
+            self.scales = np.empty(len(self.matrix), dtype=np.float32)
+
+            def quantize(batch, start):
+                scales = np.abs(batch).max(axis=1) / 127
+                scales[scales == 0] = 1.0
+                self.scales[start : start + len(batch)] = scales
+                return np.round(batch / scales[:, None]).astype(np.int8)
+
+            self.codes = self._encode_batches(quantize, with_start=True)
+        elif encoding == "truncate":
+            self.codes = self._encode_batches(
+                lambda batch: normalize_rows(batch[:, :dimension])
+            )
+        else:
+            rng = np.random.default_rng(seed)
+            n = len(self.matrix)
+            sample = np.asarray(
+                self.matrix[np.sort(rng.choice(n, size=min(n, 20000), replace=False))]
+            )
+            # Uncentered, so dot products (not distances) are approximated
+            _, _, components = np.linalg.svd(sample, full_matrices=False)
+            self.projection = np.ascontiguousarray(components[:dimension].T)
+            self.codes = self._encode_batches(lambda batch: batch @ self.projection)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    # Bytes held by the compressed copy (the full matrix is memory-mapped)
+    @property
+    def nbytes(self):
+        extra = self.scales.nbytes if self.scales is not None else 0
+        if self.projection is not None:
+            extra += self.projection.nbytes
+        return self.codes.nbytes + extra
+
+    def _encode_batches(self, encode, with_start=False, batch_size=8192):
+        batches = []
+        for start in range(0, len(self.matrix), batch_size):
+            batch = np.asarray(self.matrix[start : start + batch_size])
+            batches.append(encode(batch, start) if with_start else encode(batch))
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(batches)
+
+    def _encode_query(self, query):
+        if self.encoding == "truncate":
+            return normalize_rows(query[None, : self.codes.shape[1]])[0]
+        if self.encoding == "pca":
+            return query @ self.projection
+        return query
+
+    # Approximate scores of `rows` (or all rows), decoded in batches small
+    # enough for the float32 temporaries to stay in cache
+    def _approximate_scores(self, query, rows=None, batch_size=512):
+        n = len(self.codes) if rows is None else len(rows)
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, batch_size):
+            end = min(start + batch_size, n)
+            select = slice(start, end) if rows is None else rows[start:end]
+            scores[start:end] = self.codes[select].astype(np.float32) @ query
+            if self.scales is not None:
+                scores[start:end] *= self.scales[select]
+        return scores
+
+    def _search(self, query, rows, k):
+        query = normalize_rows(np.reshape(query, (1, -1)))[0]
+        scores = self._approximate_scores(self._encode_query(query), rows)
+        if not self.rescore:
+            best = top_k(scores, k)
+            return (best if rows is None else rows[best]), scores[best]
+
+        candidates = top_k(scores, max(k, self.rescore))
+        if rows is not None:
+            candidates = rows[candidates]
+        # Sorted rows read the memory-mapped matrix sequentially
+        candidates = np.sort(candidates)
+        exact = np.asarray(self.matrix[candidates]) @ query
+        best = top_k(exact, k)
+        return candidates[best], exact[best]
+
+    def search(self, query, k=5):
+        return self._search(query, None, k)
+
+    def search_subset(self, query, rows, k=5):
+        return self._search(query, np.asarray(rows, dtype=np.int64), k)
+
+
+INDEX_BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+    "hnsw": HNSWIndex,
+    "compressed": CompressedIndex,
+}
+
+
+def build_index(embeddings, backend="exact", **kwargs):
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(
+            f"Unknown vector index backend '{backend}'. "
+            f"Choose one of: {', '.join(INDEX_BACKENDS)}"
+        )
+    return INDEX_BACKENDS[backend](embeddings, **kwargs)
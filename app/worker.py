@@ -0,0 +1,88 @@
+import queue
+import threading
+import time
+import zlib
+from app import metrics
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MessageDispatcher:
+    """Bounded worker pool that processes webhook messages in the background.
+
+    Each sender is pinned to one worker (by a stable hash of the sender), and
+    every worker drains its own FIFO queue, so messages from the same sender
+    are handled strictly in arrival order while different senders run in
+    parallel.
+    """
+
+    def __init__(self, handler, workers=4, max_queue=100, name="dispatcher"):
+        self.handler = handler
+        self.name = name
+        self._queues = [queue.Queue(maxsize=max_queue) for _ in range(workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i, work_queue in enumerate(self._queues):
+                thread = threading.Thread(
+                    target=self._run,
+                    args=(work_queue,),
+                    name=f"{self.name}-{i}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _queue_for(self, sender):
+        return self._queues[zlib.crc32(sender.encode()) % len(self._queues)]
+
+    def submit(self, sender, *args):
+        self.start()
+        try:
+            self._queue_for(sender).put_nowait((time.perf_counter(), sender, args))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(f"Queue for {sender} is full")
+
+    def _run(self, work_queue):
+        while True:
+            enqueued, sender, args = work_queue.get()
+            metrics.record("queue_wait", time.perf_counter() - enqueued)
+            try:
+                with metrics.stage_timer("process"):
+                    self.handler(sender, *args)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"Failed to process message from {sender}: {e}")
+            finally:
+                work_queue.task_done()
+
+    # Block until every queued message has been processed
+    def join(self):
+        for work_queue in self._queues:
+            work_queue.join()
+
+    def queue_depth(self):
+        return sum(work_queue.qsize() for work_queue in self._queues)
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth(),
+            "workers": len(self._queues),
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
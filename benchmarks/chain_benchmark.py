@@ -0,0 +1,109 @@
+import argparse
+import os
+import sys
+import time
+import uuid
+import numpy as np
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# The module builds an OpenAI client on import; no request is ever sent here
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from app.langchain_ import build_rag_chain
+from app import metrics
+
+LISTINGS = [
+    f"""ID:{i}
+            Ubicación: Quito
+            Barrio: Cumbayá
+            Area: 120 m2
+            Precio: {150000 + i * 1000}
+            Habitaciones: 3
+            Descripción: Casa amplia con jardín y parqueadero cubierto.
+            """
+    for i in range(5)
+]
+
+
+# Fake chat model with a fixed per-call latency standing in for the network
+class SlowFakeChatModel(FakeListChatModel):
+    latency: float = 0.0
+
+    def _call(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super()._call(*args, **kwargs)
+
+
+def measure(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def report(label, timings):
+    print(
+        f"{label:<28}{np.mean(timings):>10.3f}{np.percentile(timings, 50):>10.3f}"
+        f"{np.percentile(timings, 95):>10.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chain build vs invoke overhead")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    llm = FakeListChatModel(responses=["Tenemos la propiedad ID:1 en Cumbayá."])
+
+    def invoke(chain, session_id):
+        chain.invoke(
+            {"input": "qué casas tienen en cumbayá"},
+            config={"configurable": {"session_id": session_id, "properties": LISTINGS}},
+        )
+
+    print(f"{'stage (ms)':<28}{'mean':>10}{'p50':>10}{'p95':>10}")
+    report("build chain", measure(lambda: build_rag_chain(llm), args.iterations))
+
+    chain = build_rag_chain(llm)
+    report(
+        "invoke prebuilt chain",
+        measure(lambda: invoke(chain, str(uuid.uuid4())), args.iterations),
+    )
+    report(
+        "build + invoke (per message)",
+        measure(
+            lambda: invoke(build_rag_chain(llm), str(uuid.uuid4())), args.iterations
+        ),
+    )
+
+    # Multi-turn conversations: with history, the contextualized mode pays
+    # an extra LLM round trip per turn that the direct mode skips
+    slow_llm = SlowFakeChatModel(
+        responses=["Tenemos la propiedad ID:1 en Cumbayá."], latency=args.llm_latency
+    )
+    modes = [
+        ("direct", build_rag_chain(slow_llm)),
+        ("contextualized", build_rag_chain(slow_llm, search_fn=lambda q: LISTINGS)),
+    ]
+    for mode, chain in modes:
+        metrics.reset()
+        session_id = str(uuid.uuid4())
+        timings = measure(lambda: invoke(chain, session_id), args.turns)
+        print(
+            f"\n{mode} mode, {args.turns} turns, {args.llm_latency * 1000:.0f} ms LLM"
+        )
+        report("turn", timings)
+        for stage, summary in sorted(metrics.snapshot().items()):
+            print(
+                f"  {stage:<26}{summary['count']:>6} calls"
+                f"{summary['mean_ms']:>10.3f} ms mean"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.embedding_store import load_store
+from app.vector_index import build_index, normalize_rows
+from vector_index_benchmark import recall, synthetic_embeddings, time_queries
+
+
+# Size of the embeddings as the Python lists of floats the CSV loader used to
+# keep per row: list header, one pointer and one float object per component
+def python_lists_nbytes(n, dim):
+    return n * (sys.getsizeof([0.0] * dim) + dim * sys.getsizeof(1.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compressed embedding search: memory, latency and top-k overlap"
+    )
+    parser.add_argument("--store", help="Compiled embedding store (data/embeddings)")
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dimensions", nargs="+", type=int, default=[256, 512])
+    parser.add_argument("--rescore", nargs="+", type=int, default=[0, 50])
+    args = parser.parse_args()
+
+    if args.store:
+        embeddings = load_store(args.store).embeddings
+    else:
+        embeddings = synthetic_embeddings(args.n, args.dim)
+    n, dim = embeddings.shape
+    # Queries near stored vectors, standing in for embedded user messages
+    rng = np.random.default_rng(1)
+    queries = np.asarray(embeddings[rng.choice(n, size=args.queries, replace=False)])
+    queries = normalize_rows(
+        queries + rng.standard_normal(queries.shape).astype(np.float32) * 0.05
+    )
+
+    print(f"{n} vectors x {dim} dims, {args.queries} queries, k={args.k}")
+    print(
+        f"{'index':<22}{'MB':>9}{'build s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'top-k overlap':>15}"
+    )
+    print(f"{'python lists (est.)':<22}{python_lists_nbytes(n, dim) / 2**20:>9.1f}")
+
+    # What search_properties uses today
+    exact = build_index(embeddings, backend="exact")
+    truth, latencies = time_queries(lambda q: exact.search(q, args.k)[0], queries)
+    print(
+        f"{'float32 exact':<22}{exact.matrix.nbytes / 2**20:>9.1f}{0.0:>9.2f}"
+        f"{np.percentile(latencies, 50):>9.3f}{np.percentile(latencies, 95):>9.3f}"
+        f"{1.0:>15.3f}"
+    )
+
+    configurations = [("float16", dim), ("int8", dim)]
+    for encoding in ("truncate", "pca"):
+        configurations += [(encoding, d) for d in args.dimensions if d < dim]
+    for encoding, dimension in configurations:
+        start = time.perf_counter()
+        index = build_index(
+            embeddings, backend="compressed", encoding=encoding, dimension=dimension
+        )
+        build_time = time.perf_counter() - start
+        name = encoding if dimension == dim else f"{encoding}-{dimension}"
+        for rescore in args.rescore:
+            index.rescore = rescore
+            results, latencies = time_queries(
+                lambda q: index.search(q, args.k)[0], queries
+            )
+            print(
+                f"{f'{name} rescore={rescore}':<22}{index.nbytes / 2**20:>9.1f}"
+                f"{build_time:>9.2f}{np.percentile(latencies, 50):>9.3f}"
+                f"{np.percentile(latencies, 95):>9.3f}"
+                f"{recall(results, truth, args.k):>15.3f}"
+            )
+    print(
+        "\nMB is the memory each index holds; re-scoring reads only the "
+        "candidate rows of the memory-mapped float32 matrix."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+import config
+import app.utils as utils
+from app import metrics
+from app.catalog import Catalog
+from app.embedding_store import load_store, write_store
+from webhook_load_benchmark import FakeEmbeddings, fake_embedding, make_listings
+
+SPANISH_STOP_WORDS = (
+    "de la que el en y a los del se las por un para con no una su al lo como "
+    "más pero sus le ya o este sí porque esta entre cuando muy sin sobre "
+    "también me hasta hay donde quien desde todo nos durante todos uno les "
+    "ni contra otros ese eso ante ellos e esto mí antes algunos qué unos yo "
+    "otro otras otra él tanto esa estos mucho quienes nada muchos cual poco "
+    "ella estar estas algunas algo nosotros mi mis tú te ti tu tus"
+).split()
+
+QUERIES = [
+    "casas en cumbayá",
+    "departamento en la carolina con parqueadero",
+    "casa con jardín y piscina en tumbaco",
+    "departamentos en samborondón",
+    "algo tranquilo y bonito para mi familia",
+    "busco un lugar cerca de la universidad",
+    "3 habitaciones en urdesa bajo 300000",
+    "conjunto cerrado con seguridad",
+    "quiero vivir en el valle",
+    "casa moderna con balcón y vista",
+]
+
+
+def run(store, queries, mode, embeddings):
+    config.LEXICAL_RETRIEVAL = mode
+    metrics.reset()
+    calls_before = embeddings.calls
+    results, timings = [], []
+    for query in queries:
+        # Every query pays for its embedding, as a first-time query would
+        utils.get_embedding_cache().clear()
+        start = time.perf_counter()
+        ids, _, _ = utils.search_properties(store, query)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append(ids)
+    return results, np.array(timings), embeddings.calls - calls_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector vs hybrid retrieval")
+    parser.add_argument("--listings", type=int, default=5000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    parser.add_argument("--id-queries", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        utils.get_stop_words()
+    except Exception as e:
+        # Offline without the NLTK corpus: use its most frequent Spanish words
+        print(f"NLTK stopwords unavailable ({e}), using a short built-in list")
+        utils._stop_words = set(SPANISH_STOP_WORDS)
+
+    rng = random.Random(0)
+    listings = make_listings(args.listings)
+    id_queries = {
+        f"info de la propiedad {i}": i
+        for i in rng.sample(range(1, args.listings + 1), args.id_queries)
+    }
+    queries = QUERIES + list(id_queries)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        import json
+
+        listings_path = os.path.join(workdir, "listings.json")
+        agents_path = os.path.join(workdir, "agents.json")
+        with open(listings_path, "w") as f:
+            json.dump(listings, f, ensure_ascii=False)
+        with open(agents_path, "w") as f:
+            json.dump({}, f)
+        utils._catalog = Catalog(listings_path, agents_path)
+
+        texts = [utils.clean_and_transform_data(p) for p in listings]
+        write_store(
+            workdir,
+            np.array([fake_embedding(t, args.dimension) for t in texts]),
+            [p["id"] for p in listings],
+            [utils.property_to_string(p) for p in listings],
+        )
+        store = load_store(workdir)
+        embeddings = FakeEmbeddings(args.embed_latency_ms / 1000, args.dimension)
+        utils.openai_embeddings = embeddings
+        utils.get_lexical_index(store)  # Built once, outside the timings
+
+        vector, vector_ms, vector_calls = run(store, queries, "off", embeddings)
+        hybrid, hybrid_ms, hybrid_calls = run(store, queries, "hybrid", embeddings)
+        paths = {
+            dict(labels)["path"]: count
+            for (name, labels), count in metrics._counters.items()
+            if name == "retrieval_total"
+        }
+
+    print(f"{len(queries)} queries over {args.listings} listings")
+    print(f"{'mode':<10}{'embed calls':>12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode, timings, calls in (
+        ("vector", vector_ms, vector_calls),
+        ("hybrid", hybrid_ms, hybrid_calls),
+    ):
+        print(
+            f"{mode:<10}{calls:>12}{np.mean(timings):>10.1f}"
+            f"{np.percentile(timings, 50):>10.1f}{np.percentile(timings, 95):>10.1f}"
+        )
+    skipped = paths.get("lexical", 0) / len(queries)
+    print(f"\nhybrid paths: {paths}, {skipped:.0%} of queries skipped the embedding")
+
+    overlap = np.mean(
+        [len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(vector, hybrid)]
+    )
+    print(f"top-5 overlap hybrid vs vector: {overlap:.2f}")
+    offset = len(QUERIES)
+    for label, results in (("vector", vector), ("hybrid", hybrid)):
+        found = sum(
+            target in results[offset + i]
+            for i, target in enumerate(id_queries.values())
+        )
+        print(f"{label}: requested property id in top 5 for {found}/{len(id_queries)}")
+
+
+if __name__ == "__main__":
+    main()
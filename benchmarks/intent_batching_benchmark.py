@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import torch
+from app.utils import classify_intent, classify_intents, get_intent_model
+from app.intent_batcher import IntentBatcher
+
+MESSAGES = [
+    "hola buenas tardes",
+    "quiero hablar con un agente",
+    "qué casas tienen en venta en cumbayá",
+    "me gustaría agendar una visita para el departamento",
+    "cuánto cuesta la alícuota del departamento en la carolina",
+    "tienen departamentos de 3 habitaciones con parqueadero",
+    "pueden llamarme para ver la propiedad",
+    "busco una casa con jardín en el valle de los chillos",
+    "precio",
+    "necesito contactar a un asesor inmobiliario por favor",
+]
+
+
+def run(label, fn, n):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32}{elapsed:>10.2f} s{n / elapsed:>12.1f} msg/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent classification throughput")
+    parser.add_argument("--messages", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    model, tokenizer = get_intent_model()
+    texts = [MESSAGES[i % len(MESSAGES)] for i in range(args.messages)]
+    print(f"{args.messages} messages on CPU, {args.threads} torch threads")
+
+    # Warm up the model so the first measurement is not penalized
+    classify_intents(texts[:8], model, tokenizer)
+
+    run(
+        "batch size 1",
+        lambda: [classify_intent(text, model, tokenizer) for text in texts],
+        args.messages,
+    )
+    for batch_size in (4, 8, 16, 32):
+        run(
+            f"classify_intents batch {batch_size}",
+            lambda: [
+                classify_intents(texts[i : i + batch_size], model, tokenizer)
+                for i in range(0, len(texts), batch_size)
+            ],
+            args.messages,
+        )
+
+    # Concurrent callers through the micro-batcher, as under webhook load
+    batcher = IntentBatcher(
+        lambda batch: classify_intents(batch, model, tokenizer),
+        max_batch_size=args.concurrency,
+        max_wait_ms=args.max_wait_ms,
+    )
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        run(
+            f"micro-batcher x{args.concurrency} callers",
+            lambda: list(pool.map(batcher.classify, texts)),
+            args.messages,
+        )
+    print(f"mean batch size: {batcher.stats()['mean_batch_size']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
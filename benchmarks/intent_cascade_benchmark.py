@@ -0,0 +1,120 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import app.utils as utils
+from app.attribute_filter import normalize
+from app.intent_cascade import IntentCascade, LinearIntentModel
+
+
+def summarize(latencies):
+    return (
+        np.mean(latencies),
+        np.percentile(latencies, 50),
+        np.percentile(latencies, 95),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent cascade vs. full model")
+    parser.add_argument("--model", default="./results/model-6")
+    parser.add_argument("--train-set", default="./data/contact_agent_dataset.csv")
+    # Same test set and label mapping as classifier_test.py
+    parser.add_argument("--test-set", default="./data/test_contact_agent.csv")
+    parser.add_argument(
+        "--thresholds", nargs="+", type=float, default=[0.7, 0.8, 0.9, 0.95, 0.99]
+    )
+    parser.add_argument(
+        "--passes",
+        type=int,
+        default=2,
+        help="Times the test set is replayed; repeats are answered by the memo",
+    )
+    args = parser.parse_args()
+
+    try:
+        utils.get_stop_words()
+    except Exception as e:
+        # Offline without the NLTK corpus: keep every word
+        print(f"NLTK stopwords unavailable ({e}), not removing stop words")
+        utils._stop_words = set()
+
+    train_df = pd.read_csv(args.train_set)
+    test_df = pd.read_csv(args.test_set)
+    label_mapping = {"contact agent": 0, "other": 1}
+    true_labels = test_df["label"].map(label_mapping).tolist()
+    queries = test_df["query"].tolist()
+
+    start = time.perf_counter()
+    linear_model = LinearIntentModel.train(
+        train_df["query"].tolist(), train_df["label"].tolist(), utils.clean_text
+    )
+    print(f"Linear model trained in {time.perf_counter() - start:.2f}s")
+
+    utils.model_path = args.model
+    model, tokenizer = utils.get_intent_model()
+    utils.classify_intent(queries[0], model, tokenizer)  # Warm up
+
+    # Reference: the transformer on every message
+    full_labels = []
+    full_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        full_labels.append(utils.classify_intent(query, model, tokenizer))
+        full_latencies.append((time.perf_counter() - start) * 1000)
+    full_predictions = [label_mapping[label] for label in full_labels]
+
+    print(
+        f"\n{'tier':<10}{'memo':>7}{'linear':>8}{'full':>7}{'mean ms':>9}"
+        f"{'p50 ms':>8}{'p95 ms':>8}{'agree':>8}{'acc':>8}{'F1':>8}"
+    )
+    accuracy = accuracy_score(true_labels, full_predictions)
+    _, _, f1, _ = precision_recall_fscore_support(
+        true_labels, full_predictions, average="weighted"
+    )
+    mean, p50, p95 = summarize(full_latencies)
+    print(
+        f"{'full only':<10}{0:>7.1%}{0:>8.1%}{1:>7.1%}{mean:>9.2f}{p50:>8.2f}"
+        f"{p95:>8.2f}{1:>8.4f}{accuracy:>8.4f}{f1:>8.4f}"
+    )
+
+    for threshold in args.thresholds:
+        cascade = IntentCascade(
+            linear_model,
+            lambda text: utils.classify_intent(text, model, tokenizer),
+            normalize=lambda text: normalize(utils.clean_text(text)),
+            threshold=threshold,
+        )
+        latencies = []
+        predictions = []
+        for _ in range(args.passes):
+            for query in queries:
+                start = time.perf_counter()
+                label = cascade.classify(query)
+                latencies.append((time.perf_counter() - start) * 1000)
+                predictions.append(label_mapping[label])
+
+        # Quality is measured on the first pass; later passes are memo hits
+        first_pass = predictions[: len(queries)]
+        agreement = np.mean(np.array(first_pass) == np.array(full_predictions))
+        accuracy = accuracy_score(true_labels, first_pass)
+        _, _, f1, _ = precision_recall_fscore_support(
+            true_labels, first_pass, average="weighted"
+        )
+        rates = cascade.stats()["hit_rates"]
+        mean, p50, p95 = summarize(latencies)
+        print(
+            f"{threshold:<10}{rates['memo']:>7.1%}{rates['linear']:>8.1%}"
+            f"{rates['full']:>7.1%}{mean:>9.2f}{p50:>8.2f}{p95:>8.2f}"
+            f"{agreement:>8.4f}{accuracy:>8.4f}{f1:>8.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
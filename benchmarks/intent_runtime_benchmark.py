@@ -0,0 +1,74 @@
+import argparse
+import gc
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import psutil
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+from transformers import AutoTokenizer
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.intent_model import RUNTIMES, load_intent_model
+from app.utils import classify_intents
+
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent model runtime comparison")
+    parser.add_argument("--model", default="./results/model-6")
+    # Same test set and label mapping as classifier_test.py
+    parser.add_argument("--test-set", default="./data/test_contact_agent.csv")
+    parser.add_argument("--runtimes", nargs="+", default=list(RUNTIMES))
+    args = parser.parse_args()
+
+    test_df = pd.read_csv(args.test_set)
+    label_mapping = {"contact agent": 0, "other": 1}
+    true_labels = test_df["label"].map(label_mapping).tolist()
+    queries = test_df["query"].tolist()
+    tokenizer = AutoTokenizer.from_pretrained("roberta-base")
+
+    print(
+        f"{'runtime':<12}{'load s':>8}{'RSS MB':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'acc':>8}{'F1':>8}"
+    )
+    for runtime in args.runtimes:
+        gc.collect()
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        try:
+            model = load_intent_model(args.model, runtime)
+        except (FileNotFoundError, ValueError, ImportError) as e:
+            print(f"{runtime:<12}skipped ({e})")
+            continue
+        load_time = time.perf_counter() - start
+        rss_delta = rss_mb() - rss_before
+
+        # One message at a time, as the webhook classifies them
+        latencies = []
+        predictions = []
+        for query in queries:
+            start = time.perf_counter()
+            label = classify_intents([query], model, tokenizer)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            predictions.append(label_mapping[label])
+
+        accuracy = accuracy_score(true_labels, predictions)
+        _, _, f1, _ = precision_recall_fscore_support(
+            true_labels, predictions, average="weighted"
+        )
+        print(
+            f"{runtime:<12}{load_time:>8.2f}{rss_delta:>9.1f}"
+            f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 95):>9.2f}"
+            f"{accuracy:>8.4f}{f1:>8.4f}"
+        )
+        del model
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import torch
+from sklearn.model_selection import train_test_split
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import app.utils as utils
+from app.intent_training import (
+    EpochTimer,
+    build_trainer,
+    configure_cpu_threads,
+    load_labelled_csv,
+    predict,
+    tokenize_dataset,
+    training_arguments,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Intent classifier training/eval: static vs. dynamic padding"
+    )
+    parser.add_argument("--dataset", default="./data/contact_agent_dataset.csv")
+    # Same test set as classifier_test.py
+    parser.add_argument("--test-set", default="./data/test_contact_agent.csv")
+    parser.add_argument("--model", default="roberta-base")
+    parser.add_argument("--threads", type=int, help="CPU threads (default: all cores)")
+    parser.add_argument(
+        "--max-samples", type=int, help="Train on at most this many samples"
+    )
+    args = parser.parse_args()
+
+    try:
+        utils.get_stop_words()
+    except Exception as e:
+        # Offline without the NLTK corpus: keep every word
+        print(f"NLTK stopwords unavailable ({e}), not removing stop words")
+        utils._stop_words = set()
+
+    print(f"Using {configure_cpu_threads(args.threads)} CPU threads")
+    dataset = load_labelled_csv(args.dataset, utils.clean_text)
+    train_df, _ = train_test_split(dataset, test_size=0.2, random_state=42)
+    if args.max_samples:
+        train_df = train_df.iloc[: args.max_samples]
+    test_df = load_labelled_csv(args.test_set, utils.clean_text)
+    tokenizer = AutoTokenizer.from_pretrained("roberta-base")
+
+    print(
+        f"{'mode':<10}{'tokenize s':>12}{'cached s':>10}{'epoch s':>10}"
+        f"{'eval samples/s':>16}"
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        for dynamic_padding in (False, True):
+            cache_dir = os.path.join(workdir, "cache")
+            pad = not dynamic_padding
+            start = time.perf_counter()
+            train_dataset = tokenize_dataset(
+                train_df, tokenizer, pad_to_max_length=pad, cache_dir=cache_dir
+            )
+            test_dataset = tokenize_dataset(
+                test_df, tokenizer, pad_to_max_length=pad, cache_dir=cache_dir
+            )
+            tokenize_time = time.perf_counter() - start
+            start = time.perf_counter()
+            tokenize_dataset(
+                train_df, tokenizer, pad_to_max_length=pad, cache_dir=cache_dir
+            )
+            cached_time = time.perf_counter() - start
+
+            # Same initial weights for both modes
+            torch.manual_seed(0)
+            model = AutoModelForSequenceClassification.from_pretrained(
+                args.model, num_labels=2, ignore_mismatched_sizes=True
+            )
+            epoch_timer = EpochTimer()
+            trainer = build_trainer(
+                model,
+                tokenizer,
+                training_arguments(
+                    os.path.join(workdir, "results"),
+                    dynamic_padding=dynamic_padding,
+                    num_train_epochs=1,
+                    eval_strategy="no",
+                    save_strategy="no",
+                    load_best_model_at_end=False,
+                    report_to="none",
+                ),
+                train_dataset=train_dataset,
+                dynamic_padding=dynamic_padding,
+                callbacks=[epoch_timer],
+            )
+            trainer.train()
+            _, metrics = predict(trainer, test_dataset)
+
+            mode = "dynamic" if dynamic_padding else "static"
+            print(
+                f"{mode:<10}{tokenize_time:>12.2f}{cached_time:>10.2f}"
+                f"{epoch_timer.epoch_times[0]:>10.1f}"
+                f"{metrics['test_samples_per_second']:>16.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Each scenario runs in a fresh interpreter, as a new worker or CLI would
+SCENARIOS = [
+    ("import app.utils", "import app.utils"),
+    ("import app.routes", "import app.routes"),
+    ("create_app()", "from app import create_app; create_app()"),
+    (
+        "create_app() + warmup()",
+        "from app import create_app, warmup; create_app(); warmup()",
+    ),
+]
+
+
+def time_scenario(code, env):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    return elapsed, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Block Hugging Face and NLTK network access to check offline boots",
+    )
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.offline:
+        env["HF_HUB_OFFLINE"] = "1"
+        env["TRANSFORMERS_OFFLINE"] = "1"
+
+    print(f"{'scenario':<28}{'median s':>10}{'min s':>10}")
+    for label, code in SCENARIOS:
+        timings = []
+        error = None
+        for _ in range(args.runs):
+            elapsed, error = time_scenario(code, env)
+            if error:
+                break
+            timings.append(elapsed)
+        if error:
+            print(f"{label:<28}failed: {error}")
+            continue
+        print(f"{label:<28}{statistics.median(timings):>10.2f}{min(timings):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import time
+import uuid
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# The module builds an OpenAI client lazily; no request is ever sent here
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+import app.langchain_ as langchain_
+from app.streaming import send_streamed_reply
+from app import metrics
+
+ANSWER = " ".join(
+    f"La propiedad ID:{i} está en Cumbayá, tiene 3 habitaciones, 2 baños y "
+    f"un precio de {150000 + i * 5000} dólares con alícuota de 120."
+    for i in range(20)
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first message vs full")
+    parser.add_argument("--char-delay-ms", type=float, default=1.0)
+    parser.add_argument("--min-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    # FakeListChatModel streams one character at a time, sleeping in between.
+    # It replaces the OpenAI model in the chain the webhook streams from.
+    langchain_._llm = FakeListChatModel(
+        responses=[ANSWER], sleep=args.char_delay_ms / 1000
+    )
+
+    sent = []
+    send_streamed_reply(
+        langchain_.stream_llm(
+            properties=[],
+            input="qué casas tienen en cumbayá",
+            session_id=str(uuid.uuid4()),
+        ),
+        lambda body: sent.append((time.perf_counter(), len(body))),
+        min_chars=args.min_chars,
+    )
+    summary = metrics.snapshot()
+
+    print(f"answer: {len(ANSWER)} chars in {len(sent)} messages")
+    print(f"time to first message: {summary['first_message']['mean_ms']:.0f} ms")
+    print(f"time to full answer:   {summary['full_answer']['mean_ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.vector_index import build_index, normalize_rows
+
+
+# Clustered synthetic vectors roughly shaped like a listing catalog
+def synthetic_embeddings(n, dim, n_clusters=200, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((n_clusters, dim)))
+    labels = rng.integers(0, n_clusters, size=n)
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * 0.08
+    return normalize_rows(centers[labels] + noise)
+
+
+# Replicates the original per-query cosine_similarity + argsort path
+def baseline_search(embeddings, query, k):
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    similarities = cosine_similarity(query.reshape(1, -1), embeddings).flatten()
+    return similarities.argsort()[-k:][::-1]
+
+
+def time_queries(search, queries):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def recall(results, truth, k):
+    hits = [len(set(r[:k]) & set(t[:k])) for r, t in zip(results, truth)]
+    return sum(hits) / (k * len(truth))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector index recall/latency")
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--n-probe", type=int, default=8)
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    embeddings = synthetic_embeddings(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.choice(args.n, size=args.queries, replace=False)]
+    queries = normalize_rows(
+        queries + rng.standard_normal(queries.shape).astype(np.float32) * 0.05
+    )
+
+    print(f"{args.n} vectors x {args.dim} dims, {args.queries} queries, k={args.k}")
+    print(f"{'backend':<10}{'build s':>10}{'p50 ms':>10}{'p95 ms':>10}{'recall':>10}")
+
+    exact = build_index(embeddings, backend="exact")
+    truth, latencies = time_queries(lambda q: exact.search(q, args.k)[0], queries)
+    print(
+        f"{'exact':<10}{0.0:>10.2f}{np.percentile(latencies, 50):>10.3f}"
+        f"{np.percentile(latencies, 95):>10.3f}{1.0:>10.3f}"
+    )
+
+    if not args.skip_baseline:
+        results, latencies = time_queries(
+            lambda q: baseline_search(embeddings, q, args.k), queries
+        )
+        print(
+            f"{'sklearn':<10}{0.0:>10.2f}{np.percentile(latencies, 50):>10.3f}"
+            f"{np.percentile(latencies, 95):>10.3f}"
+            f"{recall(results, truth, args.k):>10.3f}"
+        )
+
+    backends = [("ivf", {"n_probe": args.n_probe}), ("hnsw", {})]
+    for backend, kwargs in backends:
+        start = time.perf_counter()
+        try:
+            index = build_index(embeddings, backend=backend, **kwargs)
+        except ImportError as e:
+            print(f"{backend:<10}skipped ({e})")
+            continue
+        build_time = time.perf_counter() - start
+        results, latencies = time_queries(lambda q: index.search(q, args.k)[0], queries)
+        print(
+            f"{backend:<10}{build_time:>10.2f}{np.percentile(latencies, 50):>10.3f}"
+            f"{np.percentile(latencies, 95):>10.3f}"
+            f"{recall(results, truth, args.k):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+import numpy as np
+
+# Add the parent directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Replies go to the local stub transport and no OpenAI request is ever sent
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("MESSAGING_TRANSPORT", "stub")
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+NEIGHBORHOODS = [
+    ("Quito", "Cumbayá"),
+    ("Quito", "La Carolina"),
+    ("Quito", "González Suárez"),
+    ("Quito", "Tumbaco"),
+    ("Quito", "Valle de los Chillos"),
+    ("Guayaquil", "Samborondón"),
+    ("Guayaquil", "Urdesa"),
+]
+
+# Each simulated user plays one of these conversations in order; "{id}"
+# is replaced with a listing id when the user asks for an agent
+CONVERSATIONS = [
+    ["hola buenas tardes", "qué casas tienen en venta en cumbayá"],
+    [
+        "busco departamento de 3 habitaciones en la carolina bajo 200000",
+        "cuánto es la alícuota",
+        "tiene parqueadero",
+    ],
+    [
+        "casas con jardín en tumbaco",
+        "quiero hablar con un agente",
+        "{id}",
+    ],
+    ["departamentos en samborondón entre 100k y 150k", "y en urdesa"],
+    ["me gustaría agendar una visita", "cancelar", "qué casas tienen en venta"],
+]
+
+
+# Bag of hashed words, so similar texts get similar vectors
+def fake_embedding(text, dimension):
+    vector = np.zeros(dimension, dtype=np.float32)
+    for word in text.lower().split():
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dimension] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class FakeEmbeddings:
+    def __init__(self, latency, dimension):
+        self.latency = latency
+        self.dimension = dimension
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        time.sleep(self.latency)
+        return [fake_embedding(text, self.dimension) for text in texts]
+
+
+# Fake chat model with a fixed per-call latency standing in for the network
+class SlowFakeChatModel(FakeListChatModel):
+    latency: float = 0.0
+
+    def _call(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super()._call(*args, **kwargs)
+
+
+# Keyword classifier standing in for the RoBERTa model
+def fake_classifier(latency):
+    def classify(text, model=None, tokenizer=None):
+        time.sleep(latency)
+        keywords = ("agente", "visita", "asesor", "llamarme")
+        return "contact agent" if any(k in text for k in keywords) else "other"
+
+    return classify
+
+
+def make_listings(n, seed=0):
+    rng = random.Random(seed)
+    listings = []
+    for i in range(1, n + 1):
+        location, neighborhood = rng.choice(NEIGHBORHOODS)
+        bedrooms = rng.randint(1, 5)
+        listings.append(
+            {
+                "id": i,
+                "location": location,
+                "neighborhood": neighborhood,
+                "area": f"{rng.randint(45, 400)} m2",
+                "price": f"${rng.randrange(60000, 900000, 5000):,}",
+                "fee": f"${rng.randint(0, 300)}",
+                "bedrooms": f"{bedrooms} habitaciones",
+                "bathrooms": f"{rng.randint(1, bedrooms + 1)} baños",
+                "parking_spots": f"{rng.randint(0, 3)} parqueaderos",
+                "description": " ".join(
+                    rng.choice(
+                        [
+                            "Hermosa casa con jardín y vista a las montañas.",
+                            "Departamento moderno cerca de centros comerciales.",
+                            "Amplia sala comedor, cocina equipada y balcón.",
+                            "Conjunto cerrado con seguridad 24 horas y piscina.",
+                            "Excelente ubicación, a pasos del parque.",
+                        ]
+                    )
+                    for _ in range(rng.randint(3, 12))
+                ),
+                "url": f"https://www.plusvalia.com/propiedades/{i}.html",
+                "page": 1,
+            }
+        )
+    return listings
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Point the app at a synthetic catalog and embedding store and install the
+# fakes; returns the Flask app
+def setup(args, workdir):
+    rss = {"start": peak_rss_mb()}
+
+    import app.utils as utils
+    import app.routes as routes
+    import app.langchain_ as langchain_
+    from app import create_app, messaging
+    from app.catalog import Catalog
+    from app.embedding_store import load_store, write_store
+    import config
+
+    rss["import"] = peak_rss_mb()
+
+    try:
+        utils.get_stop_words()
+    except Exception as e:
+        # Offline without the NLTK corpus: keep every word
+        print(f"NLTK stopwords unavailable ({e}), not removing stop words")
+        utils._stop_words = set()
+
+    listings = make_listings(args.listings)
+    listings_path = os.path.join(workdir, "property_listings.json")
+    agents_path = os.path.join(workdir, "agent_data.json")
+    with open(listings_path, "w") as f:
+        json.dump(listings, f, ensure_ascii=False)
+    with open(agents_path, "w") as f:
+        json.dump(
+            {str(p["id"]): {"phone_number": "+593990000000"} for p in listings}, f
+        )
+    utils._catalog = Catalog(listings_path, agents_path)
+
+    store_dir = os.path.join(workdir, "store")
+    texts = [utils.clean_and_transform_data(p) for p in listings]
+    write_store(
+        store_dir,
+        np.array([fake_embedding(t, args.dimension) for t in texts]),
+        [p["id"] for p in listings],
+        [utils.property_to_string(p) for p in listings],
+    )
+    store = load_store(store_dir)
+    utils.load_properties_with_embeddings = lambda: store
+    routes.load_properties_with_embeddings = lambda: store
+
+    embeddings = FakeEmbeddings(args.embed_latency_ms / 1000, args.dimension)
+    utils.openai_embeddings = embeddings
+    langchain_._llm = SlowFakeChatModel(
+        responses=[
+            "Tenemos la propiedad ID:12 en Cumbayá con 3 habitaciones y jardín. "
+            "También la propiedad ID:40 en Tumbaco, cerca del parque."
+        ],
+        latency=args.llm_latency_ms / 1000,
+    )
+    messaging._messenger = messaging.Messenger(
+        messaging.StubTransport(latency=args.send_latency_ms / 1000),
+        workers=args.concurrency,
+        max_queue=10000,
+    )
+    if not args.real_intent_model:
+        classify = fake_classifier(args.classify_latency_ms / 1000)
+        routes.classify_intent = classify
+        routes.get_intent_model = lambda: (None, None)
+        if config.INTENT_CASCADE:
+            # Linear tier trained on the scripted messages, labelled by the fake
+            from app.intent_cascade import IntentCascade, LinearIntentModel
+
+            messages = [m for c in CONVERSATIONS for m in c if m != "{id}"]
+            utils._intent_cascade = IntentCascade(
+                LinearIntentModel.train(
+                    messages, [classify(m) for m in messages], utils.clean_text
+                ),
+                classify,
+                threshold=config.INTENT_CASCADE_THRESHOLD,
+                memo_size=config.INTENT_MEMO_SIZE,
+            )
+
+    app = create_app()
+    rss["setup"] = peak_rss_mb()
+    return app, embeddings, rss
+
+
+def make_poster(app, use_server):
+    if not use_server:
+        local = threading.local()
+
+        def post(data):
+            # Flask test clients are not shared between threads
+            if not hasattr(local, "client"):
+                local.client = app.test_client()
+            return local.client.post("/whatsapp", data=data).status_code
+
+        return post, lambda: None
+
+    import requests
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_port}/whatsapp"
+    session = requests.Session()
+
+    def post(data):
+        return session.post(url, data=data).status_code
+
+    return post, server.shutdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline /whatsapp load test")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--listings", type=int, default=2000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--send-latency-ms", type=float, default=150)
+    parser.add_argument("--classify-latency-ms", type=float, default=20)
+    parser.add_argument(
+        "--real-intent-model",
+        action="store_true",
+        help="Classify with results/model-6 instead of the keyword fake",
+    )
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Serve the app with a local threaded WSGI server instead of "
+        "the Flask test client",
+    )
+    parser.add_argument(
+        "--retry-rate",
+        type=float,
+        default=0.0,
+        help="Share of messages redelivered with the same MessageSid while the "
+        "first delivery is still running, as Twilio does on slow responses",
+    )
+    parser.add_argument("--retry-after-ms", type=float, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON results file")
+    args = parser.parse_args()
+
+    from app import metrics
+    import app.routes as routes
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app, embeddings, rss = setup(args, workdir)
+        post, stop = make_poster(app, args.server)
+
+        rng = random.Random(args.seed)
+        users = [
+            (f"whatsapp:+5939{i:08d}", rng.choice(CONVERSATIONS))
+            for i in range(args.users)
+        ]
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+
+        retries = ThreadPoolExecutor(max_workers=args.concurrency)
+
+        def redeliver(data):
+            time.sleep(args.retry_after_ms / 1000)
+            post(data)
+
+        def play(user):
+            nonlocal errors
+            sender, conversation = user
+            for message in conversation:
+                body = message.format(id=rng.randint(1, args.listings))
+                data = {"Body": body, "From": sender, "MessageSid": f"SM{uuid4().hex}"}
+                if rng.random() < args.retry_rate:
+                    retries.submit(redeliver, data)
+                start = time.perf_counter()
+                status = post(data)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if status >= 400:
+                        errors += 1
+
+        metrics.reset()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(play, users))
+        elapsed = time.perf_counter() - start
+        retries.shutdown()
+        stop()
+        rss["load"] = peak_rss_mb()
+
+    latencies_ms = np.array(latencies) * 1000
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": vars(args),
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_ms": {
+            "mean": float(np.mean(latencies_ms)),
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p95": float(np.percentile(latencies_ms, 95)),
+            "p99": float(np.percentile(latencies_ms, 99)),
+        },
+        "embedding_calls": embeddings.calls,
+        "deliveries": routes.deliveries.stats(),
+        "stages": metrics.snapshot(),
+        "peak_rss_mb": rss,
+    }
+
+    print(
+        f"{results['requests']} requests ({errors} errors) in {elapsed:.2f}s, "
+        f"{results['requests_per_second']:.1f} req/s, concurrency {args.concurrency}"
+    )
+    print(
+        "latency ms: "
+        + ", ".join(f"{k} {v:.1f}" for k, v in results["latency_ms"].items())
+    )
+    print(f"\n{'stage (ms)':<20}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, summary in sorted(results["stages"].items()):
+        print(
+            f"{stage:<20}{summary['count']:>8}{summary['p50_ms']:>10.1f}"
+            f"{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}"
+        )
+    deliveries = results["deliveries"]
+    print(
+        f"deliveries: {deliveries['processed']} processed, duplicates suppressed "
+        + ", ".join(f"{k} {v}" for k, v in deliveries["suppressed"].items())
+    )
+    print("\npeak RSS MB: " + ", ".join(f"{k} {v:.0f}" for k, v in rss.items()))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"webhook_load-{results['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
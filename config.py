@@ -8,3 +8,123 @@ OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_SANDBOX_NUMBER = os.environ.get("TWILIO_SANDBOX_NUMBER")
+
+# Vector index used for property retrieval: "exact", "ivf", "hnsw" or
+# "compressed"
+VECTOR_INDEX_BACKEND = os.environ.get("VECTOR_INDEX_BACKEND", "exact")
+
+# "compressed" scans a smaller copy of the embeddings ("float16", "int8",
+# "truncate" or "pca" to VECTOR_REDUCED_DIM dimensions) and re-scores the best
+# VECTOR_RESCORE_CANDIDATES against the full-precision matrix
+VECTOR_ENCODING = os.environ.get("VECTOR_ENCODING", "int8")
+VECTOR_REDUCED_DIM = int(os.environ.get("VECTOR_REDUCED_DIM", "256"))
+VECTOR_RESCORE_CANDIDATES = int(os.environ.get("VECTOR_RESCORE_CANDIDATES", "50"))
+
+# Query embedding cache: in-process LRU size, TTL in seconds and optional
+# SQLite file shared between workers (leave empty to disable the disk tier)
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL = int(os.environ.get("EMBEDDING_CACHE_TTL", "86400"))
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "")
+
+# How listings are retrieved for the LLM: "direct" searches with the raw
+# message and skips the history rephrasing call, "contextualized" rephrases
+# the message against the chat history and searches with the result
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "direct")
+
+# Session storage for chat history and webhook state: "memory" (per process,
+# LRU + TTL) or "sqlite" (shared by all workers, survives restarts)
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", "data/sessions.sqlite3")
+SESSION_TTL = int(os.environ.get("SESSION_TTL", "86400"))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", "10000"))
+# Chat history sent to the LLM is trimmed to this many turns and tokens
+HISTORY_MAX_TURNS = int(os.environ.get("HISTORY_MAX_TURNS", "6"))
+HISTORY_MAX_TOKENS = int(os.environ.get("HISTORY_MAX_TOKENS", "1500"))
+
+# Acknowledge the Twilio webhook immediately and reply from background
+# workers instead of inside the HTTP request
+ASYNC_WEBHOOK = os.environ.get("ASYNC_WEBHOOK", "false").lower() == "true"
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "4"))
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "100"))
+
+# Twilio retries a webhook delivery that is slow to answer, with the same
+# MessageSid. Deliveries are deduplicated on it: a retry of a message still
+# being processed waits up to WEBHOOK_DEDUPE_WAIT seconds for its reply, and a
+# retry of a finished one (within WEBHOOK_DEDUPE_TTL seconds) gets the stored
+# reply. Nothing is recomputed or sent twice. Twilio stops waiting for the
+# webhook after 15 seconds, so keep WEBHOOK_DEDUPE_WAIT well below that
+WEBHOOK_DEDUPE_TTL = int(os.environ.get("WEBHOOK_DEDUPE_TTL", "3600"))
+WEBHOOK_DEDUPE_SIZE = int(os.environ.get("WEBHOOK_DEDUPE_SIZE", "10000"))
+WEBHOOK_DEDUPE_WAIT = float(os.environ.get("WEBHOOK_DEDUPE_WAIT", "10"))
+
+# Micro-batch concurrent intent classifications into one forward pass
+INTENT_BATCHING = os.environ.get("INTENT_BATCHING", "false").lower() == "true"
+INTENT_MAX_BATCH_SIZE = int(os.environ.get("INTENT_MAX_BATCH_SIZE", "16"))
+INTENT_MAX_WAIT_MS = float(os.environ.get("INTENT_MAX_WAIT_MS", "5"))
+
+# Intent classifier runtime: "pytorch", "quantized" (dynamic int8),
+# "torchscript", "onnx" or "onnx-int8". The last three need the artifacts
+# exported by `python app/intent_model.py`
+INTENT_MODEL_RUNTIME = os.environ.get("INTENT_MODEL_RUNTIME", "pytorch")
+
+# Classify intents with a cascade: a memo of normalized messages already seen,
+# then a TF-IDF + logistic regression model (results/intent-linear.joblib,
+# trained from data/contact_agent_dataset.csv if missing), and the transformer
+# only when the linear model's probability is below INTENT_CASCADE_THRESHOLD
+INTENT_CASCADE = os.environ.get("INTENT_CASCADE", "false").lower() == "true"
+INTENT_CASCADE_THRESHOLD = float(os.environ.get("INTENT_CASCADE_THRESHOLD", "0.9"))
+INTENT_MEMO_SIZE = int(os.environ.get("INTENT_MEMO_SIZE", "4096"))
+
+# Restrict vector search to listings matching the price, bedroom and
+# neighborhood constraints parsed from the message
+METADATA_FILTERING = os.environ.get("METADATA_FILTERING", "true").lower() == "true"
+
+# Stream LLM answers and send them as WhatsApp messages of up to 1600
+# characters, split at sentence boundaries, as soon as each part is ready
+STREAM_REPLIES = os.environ.get("STREAM_REPLIES", "false").lower() == "true"
+STREAM_MIN_CHARS = int(os.environ.get("STREAM_MIN_CHARS", "400"))
+
+# Reuse the answer to an earlier first message when a new conversation opens
+# with a near-identical question (cosine similarity of the query embeddings
+# at least the threshold) that retrieved the same listings
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "false").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+
+# Token budget shared by the retrieved listings and the chat history in each
+# prompt; listing descriptions are shortened to LISTING_DESCRIPTION_TOKENS.
+# TOKEN_COUNTER is "tiktoken" (falls back to an estimate offline) or "approx"
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", "3000"))
+LISTING_DESCRIPTION_TOKENS = int(os.environ.get("LISTING_DESCRIPTION_TOKENS", "120"))
+TOKEN_COUNTER = os.environ.get("TOKEN_COUNTER", "tiktoken")
+
+# Outbound WhatsApp messages: "twilio" or "stub" (records messages locally).
+# Sends share one pooled HTTP session; at most SEND_MAX_CONCURRENCY requests
+# are in flight and retryable failures (429, 5xx) are retried with backoff
+MESSAGING_TRANSPORT = os.environ.get("MESSAGING_TRANSPORT", "twilio")
+SEND_WORKERS = int(os.environ.get("SEND_WORKERS", "4"))
+SEND_QUEUE_SIZE = int(os.environ.get("SEND_QUEUE_SIZE", "200"))
+SEND_MAX_CONCURRENCY = int(os.environ.get("SEND_MAX_CONCURRENCY", "8"))
+SEND_MAX_RETRIES = int(os.environ.get("SEND_MAX_RETRIES", "3"))
+
+# Delay before confirming an agent handoff to the customer, sent from a
+# background scheduler instead of blocking the webhook
+AGENT_CONFIRMATION_DELAY = float(os.environ.get("AGENT_CONFIRMATION_DELAY", "5"))
+SCHEDULER_MAX_PENDING = int(os.environ.get("SCHEDULER_MAX_PENDING", "10000"))
+
+# Messages slower than SLOW_REQUEST_MS are logged with a per-stage breakdown.
+# With PROFILE_SAMPLE_EVERY=N, one message in N runs under cProfile and the
+# profile of a slow one is printed (and saved to PROFILE_DIR if set)
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "5000"))
+PROFILE_SAMPLE_EVERY = int(os.environ.get("PROFILE_SAMPLE_EVERY", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "")
+
+# "hybrid" adds a BM25 index over the listings: its scores are fused with the
+# vector scores (HYBRID_ALPHA is the vector weight), and when the top results
+# contain at least LEXICAL_MIN_COVERAGE of the query's terms (idf-weighted)
+# the embedding call is skipped. "off" uses vector search only
+LEXICAL_RETRIEVAL = os.environ.get("LEXICAL_RETRIEVAL", "off")
+HYBRID_ALPHA = float(os.environ.get("HYBRID_ALPHA", "0.7"))
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", "50"))
+LEXICAL_MIN_COVERAGE = float(os.environ.get("LEXICAL_MIN_COVERAGE", "1.0"))
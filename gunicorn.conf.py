@@ -0,0 +1,13 @@
+# gunicorn -c gunicorn.conf.py run:app
+from app import warmup
+
+bind = "0.0.0.0:5100"
+workers = 4
+
+# Load the app and its models once in the master process; forked workers
+# then share that memory copy-on-write
+preload_app = True
+
+
+def on_starting(server):
+    warmup()
@@ -1,4 +1,4 @@
-from app import create_app
+from app import create_app, warmup
 import logging
 
 app = create_app()
@@ -6,4 +6,6 @@ app = create_app()
 if __name__ == "__main__":
     # Enable logging
     logging.basicConfig(level=logging.DEBUG)
+    # Load models and clients before serving the first message
+    warmup()
     app.run(debug=True, host="0.0.0.0", port=5100)
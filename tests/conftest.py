@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Add the repository root to the sys.path so tests can import app and config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,114 @@
+import hashlib
+import numpy as np
+import pytest
+from app import embedding_cache
+from app.embedding_cache import EmbeddingCache
+
+
+class FakeEmbeddings:
+    """Local stand-in for utils.openai_embeddings that counts its calls."""
+
+    def __init__(self, dimension=8):
+        self.dimension = dimension
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+    def vector(self, text):
+        seed = int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:4], "little")
+        return np.random.default_rng(seed).standard_normal(self.dimension)
+
+    @property
+    def embedded(self):
+        return [text for call in self.calls for text in call]
+
+
+def normalize(text):
+    return " ".join(text.lower().strip("!?¿¡. ").split())
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_repeated_query_is_embedded_once():
+    embed = FakeEmbeddings()
+    cache = EmbeddingCache(embed)
+    first = cache.embed_query("casas en cumbayá")
+    second = cache.embed_query("casas en cumbayá")
+    assert embed.embedded == ["casas en cumbayá"]
+    np.testing.assert_array_equal(first, second)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    embed = FakeEmbeddings()
+    cache = EmbeddingCache(embed, max_size=2)
+    cache.embed_query("a")
+    cache.embed_query("b")
+    cache.embed_query("a")  # "b" is now the least recently used
+    cache.embed_query("c")
+    assert cache.stats()["size"] == 2
+
+    cache.embed_query("a")
+    assert embed.embedded == ["a", "b", "c"]
+    cache.embed_query("b")
+    assert embed.embedded == ["a", "b", "c", "b"]
+
+
+def test_ttl_expiry(clock):
+    embed = FakeEmbeddings()
+    cache = EmbeddingCache(embed, ttl=60)
+    cache.embed_query("hola")
+    clock[0] += 59
+    cache.embed_query("hola")
+    assert embed.embedded == ["hola"]
+
+    clock[0] += 2
+    cache.embed_query("hola")
+    assert embed.embedded == ["hola", "hola"]
+
+
+def test_normalized_keys_share_an_entry():
+    embed = FakeEmbeddings()
+    cache = EmbeddingCache(embed, normalize=normalize)
+    first = cache.embed_query("Hola!")
+    second = cache.embed_query("  hola ")
+    assert embed.embedded == ["Hola!"]
+    np.testing.assert_array_equal(first, second)
+
+
+def test_duplicates_within_a_batch_are_embedded_once():
+    embed = FakeEmbeddings()
+    cache = EmbeddingCache(embed, normalize=normalize)
+    vectors = cache.embed(["Hola", "casas", "hola!", "casas"])
+    assert embed.calls == [["Hola", "casas"]]
+    np.testing.assert_array_equal(vectors[0], vectors[2])
+    np.testing.assert_array_equal(vectors[1], vectors[3])
+    assert cache.stats()["misses"] == 2
+
+
+def test_sqlite_tier_is_shared_between_caches(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    first_embed = FakeEmbeddings()
+    first = EmbeddingCache(first_embed, disk_path=path)
+    vector = first.embed_query("departamento en la carolina")
+
+    # A second cache (another worker) finds the vector on disk
+    second_embed = FakeEmbeddings()
+    second = EmbeddingCache(second_embed, disk_path=path)
+    found = second.embed_query("departamento en la carolina")
+    assert second_embed.calls == []
+    np.testing.assert_allclose(found, vector)
+    assert second.stats()["disk_hits"] == 1
+
+    # and keeps it in memory afterwards
+    second.embed_query("departamento en la carolina")
+    assert second.stats()["hits"] == 1
+    assert second_embed.calls == []